@@ -0,0 +1,116 @@
+"""Token authentication with cached token lookups.
+
+``TokenAuthentication`` joins ``authtoken_token`` with the user table on
+every request. ``CachedTokenAuthentication`` keeps the result in a
+bounded in-process LRU for ``TOKEN_AUTH_CACHE['TTL']`` seconds. With
+``SHARED`` enabled the lookups are also stored in the Django cache and
+every hit is checked against a per-token version there, so a logout,
+deactivation or password change in one worker applies to all of them
+at once. Without it, other workers may accept a revoked token until
+their entry expires.
+"""
+import collections
+import copy
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from core.versions import bump_versions, get_version
+
+Entry = collections.namedtuple(
+    'Entry', ('user', 'token', 'version', 'expires')
+)
+
+
+def digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def version_name(key):
+    return f'auth-token:{digest(key)}'
+
+
+def shared_key(key):
+    return f'auth-token-entry:{digest(key)}'
+
+
+class TokenCache:
+    """Thread-safe LRU of token key -> Entry with expiry."""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def discard(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache(settings.TOKEN_AUTH_CACHE['SIZE'])
+
+
+def invalidate(keys):
+    """Forget cached lookups of the tokens in every worker."""
+    keys = list(keys)
+    token_cache.discard(keys)
+    if keys and settings.TOKEN_AUTH_CACHE['SHARED']:
+        bump_versions(version_name(key) for key in keys)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        options = settings.TOKEN_AUTH_CACHE
+        # Read before the database: a change that lands in between bumps
+        # the version and the stored entry is never used.
+        version = (
+            get_version(version_name(key)) if options['SHARED'] else None
+        )
+        entry = token_cache.get(key)
+        if entry is not None and entry.version == version:
+            # Requests must not share one mutable user instance.
+            return copy.copy(entry.user), entry.token
+        if options['SHARED']:
+            entry = cache.get(shared_key(key))
+            if entry is not None and entry.version == version:
+                token_cache.set(key, entry._replace(
+                    expires=time.monotonic() + options['TTL']
+                ))
+                return copy.copy(entry.user), entry.token
+        user, token = super().authenticate_credentials(key)
+        entry = Entry(
+            copy.copy(user), token, version,
+            time.monotonic() + options['TTL'],
+        )
+        token_cache.set(key, entry)
+        if options['SHARED']:
+            cache.set(shared_key(key), entry, options['TTL'])
+        return user, token
@@ -1,11 +1,47 @@
+from django import forms
 from django_filters import rest_framework as filters
 
+from core import trending
+from recipes import postings, search
 from recipes.models import Ingredient, Recipe, Tag
 
 
+class IntegerFilter(filters.Filter):
+    field_class = forms.IntegerField
+
+
+class IntegerInFilter(filters.BaseInFilter, IntegerFilter):
+    pass
+
+
 class RecipeFilter(filters.FilterSet):
-    """Recipes filtering by tags, author, favorite, shopping cart."""
+    """Recipes filtering by tags, author, favorite, shopping cart.
 
+    ``search`` matches the name and the text and orders the results by
+    relevance. ``ingredients`` keeps the recipes having all of the
+    listed ingredients but ``max_missing``, the ones having more of them
+    first; ``exclude_ingredients`` drops recipes having any of the
+    listed ones. Both are answered from ``recipes.postings``.
+    ``ordering=trending`` puts the recipes trending now first.
+    """
+
+    search = filters.CharFilter(
+        method='get_search',
+    )
+    ingredients = IntegerInFilter(
+        method='get_ingredients',
+    )
+    exclude_ingredients = IntegerInFilter(
+        method='get_ingredients',
+    )
+    max_missing = IntegerFilter(
+        method='get_ingredients',
+        min_value=0,
+    )
+    ordering = filters.ChoiceFilter(
+        choices=(('trending', 'Популярные сейчас'),),
+        method='get_ordering',
+    )
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
@@ -30,9 +66,36 @@ class RecipeFilter(filters.FilterSet):
                 )
         return queryset
 
+    def get_search(self, queryset, name, value):
+        return search.search(queryset, value)
+
+    def get_ordering(self, queryset, name, value):
+        return queryset.order_by(*trending.ORDERING)
+
+    def get_ingredients(self, queryset, name, value):
+        # The ingredient filters depend on each other and are applied
+        # together in filter_queryset.
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        include = self.form.cleaned_data.get('ingredients')
+        exclude = self.form.cleaned_data.get('exclude_ingredients') or ()
+        if include:
+            return postings.rank_by_coverage(queryset, postings.coverage(
+                include, exclude,
+                self.form.cleaned_data.get('max_missing') or 0,
+            ))
+        if exclude:
+            return postings.excluding(queryset, exclude)
+        return queryset
+
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'search', 'author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+            'ingredients', 'exclude_ingredients', 'max_missing', 'ordering',
+        )
 
 
 class IngredientFilter(filters.FilterSet):
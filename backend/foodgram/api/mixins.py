@@ -0,0 +1,59 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.versions import get_version
+
+
+class VersionedListCacheMixin:
+    """Cache of serialized list responses with ETag support.
+
+    Responses are stored under the current version of
+    ``cache_version_name``; bumping the version invalidates them.
+    A matching ``If-None-Match`` is answered with 304 before the ORM
+    is touched.
+
+    Only the ``cache_query_params`` of the query string are part of the
+    key, so other parameters, their order or a cache-busting suffix do
+    not add keys. Entries expire after ``LIST_CACHE_TIMEOUT``.
+    """
+
+    cache_version_name = None
+    cache_query_params = ()
+
+    def get_cache_params(self, request):
+        return {
+            param: request.query_params[param]
+            for param in self.cache_query_params
+            if param in request.query_params
+        }
+
+    def get_list_etag(self, request):
+        version = get_version(self.cache_version_name)
+        params = json.dumps(self.get_cache_params(request), sort_keys=True)
+        digest = hashlib.sha1(
+            f'{self.cache_version_name}:{version}:{params}'.encode()
+        ).hexdigest()
+        return f'"{digest}"'
+
+    def get_list_data(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs).data
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_list_etag(request)
+        headers = {'ETag': etag}
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers=headers)
+        key = f'list:{etag}'
+        data = cache.get(key)
+        if data is None:
+            data = self.get_list_data(request, *args, **kwargs)
+            cache.set(key, data, settings.LIST_CACHE_TIMEOUT)
+        return Response(data, headers=headers)
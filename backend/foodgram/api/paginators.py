@@ -1,6 +1,69 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class LimitPaginator(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class LimitCursorPaginator(CursorPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+
+
+class FeedPaginator(LimitCursorPaginator):
+    ordering = ('-pub_date', '-id')
+
+
+class CursorOptInPaginator(LimitPaginator):
+    """Page number pagination with an opt-in keyset (cursor) mode.
+
+    ``?pagination=cursor`` or a ``cursor`` from a previous response
+    switches to cursor pagination: no COUNT(*) and no OFFSET, the
+    response has only ``next``, ``previous`` and ``results``. Requests
+    whose results are not ordered by ``cursor_ordering`` always get
+    page numbers.
+    """
+
+    cursor_mode_query_param = 'pagination'
+    cursor_ordering = None
+
+    def cursor_supported(self, request):
+        return True
+
+    def use_cursor(self, request):
+        return self.cursor_supported(request) and (
+            request.query_params.get(self.cursor_mode_query_param) == 'cursor'
+            or LimitCursorPaginator.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if not self.use_cursor(request):
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = LimitCursorPaginator()
+        self.cursor_paginator.ordering = self.cursor_ordering
+        return self.cursor_paginator.paginate_queryset(
+            queryset, request, view
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePaginator(CursorOptInPaginator):
+    cursor_ordering = ('-pub_date', '-id')
+
+    def cursor_supported(self, request):
+        # Search, ingredient and trending results are not ordered by date.
+        return not (
+            request.query_params.get('search')
+            or request.query_params.get('ingredients')
+            or request.query_params.get('ordering')
+        )
+
+
+class UserPaginator(CursorOptInPaginator):
+    cursor_ordering = ('id',)
@@ -0,0 +1,32 @@
+"""SQL query budgets of the routes registered on ``router_v1``.
+
+Every route name maps HTTP methods to the maximum number of queries one
+request may run. ``api.tests.test_query_budgets`` checks the budgets and
+that read counts do not grow with page size or dataset size, so raise a
+number here only together with the change that needs it. Read budgets
+include loading the reader's membership sets into a cold cache.
+"""
+
+QUERY_BUDGETS = {
+    'api-root': {'GET': 0},
+    'ingredients-list': {'GET': 1},
+    'ingredients-detail': {'GET': 1},
+    'tags-list': {'GET': 1},
+    'tags-detail': {'GET': 1},
+    'recipes-list': {'GET': 7, 'POST': 17},
+    'recipes-detail': {'GET': 6, 'PATCH': 25, 'DELETE': 22},
+    'recipes-feed': {'GET': 7},
+    'recipes-similar': {'GET': 2},
+    'recipes-favorite': {'POST': 7, 'DELETE': 7},
+    'recipes-shopping-cart': {'POST': 14, 'DELETE': 14},
+    'recipes-favorite-bulk': {'POST': 7, 'DELETE': 7},
+    'recipes-shopping-cart-bulk': {'POST': 14, 'DELETE': 14},
+    'recipes-download-shopping-cart': {'GET': 1},
+    'recipes-download-shopping-cart-job': {'GET': 1},
+    'users-list': {'GET': 3, 'POST': 4},
+    'users-detail': {'GET': 2},
+    'users-me': {'GET': 1},
+    'users-set-password': {'POST': 2},
+    'users-subscribe': {'POST': 10, 'DELETE': 7},
+    'users-subscriptions': {'GET': 3},
+}
@@ -2,11 +2,15 @@ import base64
 
 from django.core.files.base import ContentFile
 from django.contrib.auth import password_validation
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers, validators
 
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
-from users.models import Follow, User
+from core import cart_totals, membership_sets
+from recipes import postings, thumbnails
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingListJob, Tag)
+from users.models import User
 
 
 class Base64ImageField(serializers.ImageField):
@@ -21,6 +25,20 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
+class ImageSrcsetField(serializers.ReadOnlyField):
+    """``srcset`` strings of the recipe image thumbnails by format."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = 'thumbnails'
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        return thumbnails.srcset(
+            value, request.build_absolute_uri if request else None
+        )
+
+
 class UserSerializer(serializers.ModelSerializer):
     """User Serializer."""
 
@@ -55,8 +73,9 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
     def get_is_subscribed(self, obj):
-        request_user = self.context.get('request').user.id
-        return Follow.objects.filter(user=request_user, author=obj).exists()
+        return obj.id in membership_sets.for_request(
+            self.context.get('request'), membership_sets.FOLLOWS
+        )
 
 
 class PasswordSerializer(serializers.Serializer):
@@ -103,6 +122,7 @@ class GetRecipeSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientSerializer(
         many=True, required=True, source='recipes')
     image = Base64ImageField()
+    image_srcset = ImageSrcsetField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -117,18 +137,20 @@ class GetRecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_srcset',
             'text',
             'cooking_time'
         )
 
     def get_is_favorited(self, obj):
-        request_user = self.context.get('request').user.id
-        return Favorite.objects.filter(user=request_user, recipe=obj).exists()
+        return obj.id in membership_sets.for_request(
+            self.context.get('request'), membership_sets.FAVORITES
+        )
 
     def get_is_in_shopping_cart(self, obj):
-        request_user = self.context.get('request').user.id
-        return ShoppingCart.objects.filter(
-            user=request_user, recipe=obj).exists()
+        return obj.id in membership_sets.for_request(
+            self.context.get('request'), membership_sets.CART
+        )
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -153,54 +175,221 @@ class RecipeSerializer(serializers.ModelSerializer):
             'cooking_time'
         )
 
-    def validate_ingredients(self, data):
-        ingredients = self.initial_data.get('ingredients')
-        if not ingredients:
-            raise validators.ValidationError('Выберите ингредиент!')
-        return data
-
-    def create_ingredients(self, ingredients, recipe):
+    def parse_ingredients(self, ingredients):
+        """Submitted ingredients as {ingredient id: amount}."""
+        if not isinstance(ingredients, list) or not ingredients:
+            raise validators.ValidationError(
+                {'ingredients': 'Выберите ингредиент!'}
+            )
+        amounts = {}
         for ingredient in ingredients:
-            RecipeIngredient.objects.create(
-                recipe=recipe,
-                ingredient_id=ingredient.get('id'),
-                amount=ingredient.get('amount'),)
+            try:
+                ingredient_id = int(ingredient['id'])
+                amount = int(ingredient['amount'])
+            except (KeyError, TypeError, ValueError):
+                raise validators.ValidationError(
+                    {'ingredients': 'Укажите id и количество ингредиента!'}
+                )
+            if amount < 1:
+                raise validators.ValidationError(
+                    {'ingredients': 'Количество должно быть больше нуля!'}
+                )
+            if ingredient_id in amounts:
+                raise validators.ValidationError(
+                    {'ingredients': 'Ингредиенты не должны повторяться!'}
+                )
+            amounts[ingredient_id] = amount
+        found = set(Ingredient.objects.filter(
+            id__in=amounts
+        ).order_by().values_list('id', flat=True))
+        if found != amounts.keys():
+            raise validators.ValidationError({'ingredients': (
+                'Несуществующие ингредиенты: '
+                f'{sorted(amounts.keys() - found)}'
+            )})
+        return amounts
+
+    def parse_tags(self, tags):
+        # A string would be iterated character by character.
+        if not isinstance(tags, list):
+            raise validators.ValidationError({'tags': 'Неверный id тега!'})
+        try:
+            tag_ids = {int(tag) for tag in tags}
+        except (TypeError, ValueError):
+            raise validators.ValidationError({'tags': 'Неверный id тега!'})
+        found = set(
+            Tag.objects.filter(id__in=tag_ids).values_list('id', flat=True)
+        )
+        if found != tag_ids:
+            raise validators.ValidationError(
+                {'tags': f'Несуществующие теги: {sorted(tag_ids - found)}'}
+            )
+        return tag_ids
+
+    def validate(self, data):
+        data.pop('recipes', None)
+        for field, parse, target in (
+            ('ingredients', self.parse_ingredients, 'ingredient_amounts'),
+            ('tags', self.parse_tags, 'tag_ids'),
+        ):
+            if field in self.initial_data:
+                data[target] = parse(self.initial_data[field])
+            elif not self.partial:
+                raise validators.ValidationError(
+                    {field: 'Обязательное поле.'}
+                )
+        return data
 
+    @transaction.atomic
     def create(self, validated_data):
-        validated_data.pop('recipes')
-        ingredients = self.initial_data.pop('ingredients')
-        tags = self.initial_data.pop('tags')
+        amounts = validated_data.pop('ingredient_amounts')
+        tag_ids = validated_data.pop('tag_ids')
         recipe = Recipe.objects.create(**validated_data)
-        self.create_ingredients(ingredients, recipe)
-        recipe.tags.set(tags)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+        )
+        postings.recipe_changed(recipe.id, added=amounts)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag_id=tag_id)
+            for tag_id in tag_ids
+        )
         return recipe
 
+    def update_ingredients(self, recipe, amounts):
+        """Apply only the difference with the stored ingredient rows.
+
+        Returns whether the set of ingredients changed.
+        """
+        existing = {row.ingredient_id: row for row in recipe.recipes.all()}
+        old_amounts = {
+            ingredient_id: row.amount
+            for ingredient_id, row in existing.items()
+        }
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            row = existing.get(ingredient_id)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        removed = existing.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if amounts.keys() - existing.keys():
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                )
+                for ingredient_id, amount in amounts.items()
+                if ingredient_id not in existing
+            )
+        cart_totals.recipe_changed(recipe.id, old_amounts, amounts)
+        postings.recipe_changed(
+            recipe.id, added=amounts.keys() - existing.keys(), removed=removed
+        )
+        return bool(removed or amounts.keys() - existing.keys())
+
+    def update_tags(self, recipe, tag_ids):
+        through = Recipe.tags.through
+        existing = {tag.id for tag in recipe.tags.all()}
+        if existing - tag_ids:
+            through.objects.filter(
+                recipe=recipe, tag_id__in=existing - tag_ids
+            ).delete()
+        if tag_ids - existing:
+            through.objects.bulk_create(
+                through(recipe=recipe, tag_id=tag_id)
+                for tag_id in tag_ids - existing
+            )
+        return tag_ids != existing
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        validated_data.pop('recipes')
-        ingredients = self.initial_data.pop('ingredients')
-        tags = self.initial_data.pop('tags')
-        self.create_ingredients(ingredients, instance)
-        instance.tags.clear()
-        instance.tags.set(tags)
-        return super().update(instance, validated_data)
+        # Only the edited columns are written: counters and the other
+        # maintained fields may have moved since the recipe was loaded.
+        update_fields = [
+            field for field in ('name', 'image', 'text', 'cooking_time')
+            if field in validated_data
+        ]
+        for field in update_fields:
+            setattr(instance, field, validated_data[field])
+        outdated = False
+        if 'ingredient_amounts' in validated_data:
+            outdated |= self.update_ingredients(
+                instance, validated_data['ingredient_amounts']
+            )
+        if 'tag_ids' in validated_data:
+            outdated |= self.update_tags(instance, validated_data['tag_ids'])
+        if outdated:
+            instance.similar_outdated = True
+            update_fields.append('similar_outdated')
+        instance.save(update_fields=update_fields)
+        return instance
+
+    def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            Prefetch(
+                'recipes',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ).order_by('id'),
+            ),
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+        )
+        return super().to_representation(instance)
 
 
 class RecipePreviewSerializer(serializers.ModelSerializer):
     """Short recipe serializer."""
 
     image = Base64ImageField(required=False, allow_null=True)
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time')
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """List of recipe ids for bulk favorite and cart changes.
+
+    Unknown ids fail an addition but are skipped on removal: a recipe
+    deleted meanwhile must not keep the client from clearing the rest.
+    """
+
+    MAX_RECIPES = 100
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_RECIPES,
+    )
+
+    def validate_recipes(self, value):
+        ids = set(value)
+        recipes = list(Recipe.objects.filter(id__in=ids).order_by('id').only(
+            'id', 'name', 'image', 'thumbnails', 'cooking_time'
+        ))
+        missing = ids - {recipe.id for recipe in recipes}
+        if missing and self.context['request'].method != 'DELETE':
+            raise validators.ValidationError(
+                f'Несуществующие рецепты: {sorted(missing)}'
+            )
+        return recipes
 
 
 class FollowSerializer(UserSerializer):
     """Subscription serializer."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -215,17 +404,17 @@ class FollowSerializer(UserSerializer):
             'recipes_count',
         )
 
+    def get_is_subscribed(self, obj):
+        return True
+
     def get_recipes(self, obj):
-        recipes_limit = (
-            self.context['request'].query_params.get('recipes_limit')
-        )
-        recipes = Recipe.objects.filter(author=obj).all()
-        if recipes_limit:
-            limit = int(recipes_limit)
-            serializer = RecipePreviewSerializer(recipes[:limit], many=True)
-            return serializer.data
-        serializer = RecipePreviewSerializer(recipes, many=True)
+        serializer = RecipePreviewSerializer(obj.preview_recipes, many=True)
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
+
+class ShoppingListJobSerializer(serializers.ModelSerializer):
+    """Shopping list rendering job status serializer."""
+
+    class Meta:
+        model = ShoppingListJob
+        fields = ('id', 'status', 'error', 'created', 'finished')
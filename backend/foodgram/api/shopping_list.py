@@ -0,0 +1,164 @@
+import csv
+import functools
+import hashlib
+import io
+import json
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from reportlab.lib import pagesizes
+from reportlab.lib.units import inch
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import (SimpleDocTemplate, Spacer, Table,
+                                TableStyle)
+from reportlab.rl_config import defaultPageSize
+
+from core.versions import bump_versions, get_version
+from recipes.ingredient_index import VERSION_NAME as INGREDIENTS_VERSION
+from recipes.models import CartIngredient
+
+FONT_NAME = 'Verdana'
+HEADER = 'Список покупок'
+ITERATOR_CHUNK_SIZE = 2000
+
+
+def cart_version_name(user_id):
+    return f'cart:{user_id}'
+
+
+def bump_cart_versions(user_ids):
+    """Invalidate cached shopping lists once the transaction commits.
+
+    A download racing the change can only cache the old list under the
+    old version.
+    """
+    names = [cart_version_name(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: bump_versions(names))
+
+
+def get_rows(user):
+    """Ingredient name, total amount and unit of the user's cart."""
+    return CartIngredient.objects.filter(
+        user=user
+    ).order_by(
+        'ingredient__name'
+    ).values_list(
+        'ingredient__name',
+        'total_amount',
+        'ingredient__measurement_unit'
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def register_font():
+    """Parse the TTF file once per process."""
+    pdfmetrics.registerFont(
+        TTFont(FONT_NAME, os.path.join(settings.FONTS_ROOT, 'Verdana.ttf'))
+    )
+
+
+def first_page_content(page_canvas, document):
+    page_canvas.saveState()
+    page_canvas.setFont(FONT_NAME, 18)
+    page_canvas.drawCentredString(
+        defaultPageSize[0] / 2.0,
+        defaultPageSize[1] - 50,
+        HEADER
+    )
+    page_canvas.restoreState()
+
+
+def render_pdf(rows):
+    register_font()
+    buffer = io.BytesIO()
+    document = SimpleDocTemplate(
+        buffer,
+        pagesize=pagesizes.portrait(pagesizes.A4),
+    )
+    rows = [tuple(row) for row in rows]
+    if not rows:
+        # An empty cart is a page with the header only: a table needs rows.
+        document.build([Spacer(0, 0)], onFirstPage=first_page_content)
+        return buffer.getvalue()
+    table = Table(
+        rows,
+        rowHeights=20,
+        repeatRows=1,
+        colWidths=[6*inch, 1*inch, 1*inch],
+        hAlign='CENTER'
+    )
+    table.setStyle(TableStyle([
+        ('FONTSIZE', (0, 0), (-1, -1), 18),
+        ('FONTNAME', (0, 0), (-1, -1), FONT_NAME),
+    ]))
+    document.build([table], onFirstPage=first_page_content)
+    return buffer.getvalue()
+
+
+def get_etag(user, export_format='pdf'):
+    """Strong ETag of the user's current shopping list."""
+    digest = hashlib.sha1(':'.join((
+        export_format,
+        str(user.id),
+        str(get_version(cart_version_name(user.id))),
+        str(get_version(INGREDIENTS_VERSION)),
+    )).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def get_pdf(user, etag):
+    """Rendered shopping list, cached under its ETag."""
+    key = f'shopping_cart_pdf:{etag}'
+    pdf = cache.get(key)
+    if pdf is None:
+        pdf = render_pdf(get_rows(user))
+        cache.set(key, pdf, settings.SHOPPING_LIST_CACHE_TIMEOUT)
+    return pdf
+
+
+def iter_rows(user):
+    """Stream the cart aggregation through a server-side cursor."""
+    return get_rows(user).iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+
+
+class Echo:
+    """File-like object handing written csv lines back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_text(rows):
+    yield f'{HEADER}\n\n'
+    for name, amount, measurement_unit in rows:
+        yield f'{name} ({measurement_unit}) — {amount}\n'
+
+
+def stream_json(rows):
+    separator = '['
+    for name, amount, measurement_unit in rows:
+        yield separator + json.dumps({
+            'name': name,
+            'amount': amount,
+            'measurement_unit': measurement_unit,
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']' if separator == ',' else '[]'
+
+
+# format: (streamer, content type, file extension)
+STREAMED_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8', 'csv'),
+    'txt': (stream_text, 'text/plain; charset=utf-8', 'txt'),
+    'json': (stream_json, 'application/json', 'json'),
+}
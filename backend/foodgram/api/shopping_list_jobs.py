@@ -0,0 +1,164 @@
+"""Asynchronous shopping-list PDF rendering.
+
+A job row is the queue entry. With ``SHOPPING_LIST_JOBS_MODE = 'thread'``
+jobs run in a small thread pool of the web process right after the
+creating transaction commits. With ``'queue'`` they wait for the
+``process_shopping_list_jobs`` management command.
+
+A job whose worker died, e.g. with the web process restarting, would
+stay running forever. ``fail_stale`` fails jobs running longer than
+``SHOPPING_LIST_JOBS_TIMEOUT`` since a worker claimed them; in thread
+mode also jobs pending that long, as their thread pool is gone. Queued
+jobs only wait for the command and are never failed for it. The command
+calls ``fail_stale`` on every pass and the status view for the polled
+job, so the client can ask for a new one. A worker saves its result
+only while the job is still running, so a late result never replaces
+the failure. Failed jobs get ``finished`` and are purged with the
+others.
+"""
+import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from recipes.models import ShoppingListJob
+
+from . import shopping_list
+
+logger = logging.getLogger(__name__)
+
+STALE_ERROR = 'Превышено время ожидания'
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.SHOPPING_LIST_JOBS_WORKERS,
+            thread_name_prefix='shopping-list',
+        )
+    return _executor
+
+
+def enqueue(user):
+    job = ShoppingListJob.objects.create(user=user)
+    if settings.SHOPPING_LIST_JOBS_MODE == 'thread':
+        transaction.on_commit(
+            lambda: get_executor().submit(run_in_thread, job.id)
+        )
+    return job
+
+
+def claim(job_id):
+    """Mark a pending job as running; False if somebody else took it."""
+    return bool(ShoppingListJob.objects.filter(
+        id=job_id, status=ShoppingListJob.PENDING
+    ).update(status=ShoppingListJob.RUNNING, started=timezone.now()))
+
+
+def run(job_id):
+    if not claim(job_id):
+        return
+    job = ShoppingListJob.objects.select_related('user').get(id=job_id)
+    try:
+        pdf = shopping_list.get_pdf(
+            job.user, shopping_list.get_etag(job.user)
+        )
+        job.file.save(f'{job.id}.pdf', ContentFile(pdf), save=False)
+        job.status = ShoppingListJob.DONE
+    except Exception as error:
+        logger.exception('Shopping list job %s failed', job_id)
+        job.status = ShoppingListJob.FAILED
+        job.error = str(error)
+    finished = ShoppingListJob.objects.filter(
+        id=job_id, status=ShoppingListJob.RUNNING
+    ).update(
+        file=job.file.name, status=job.status, error=job.error,
+        finished=timezone.now(),
+    )
+    if not finished:
+        # Failed as stale meanwhile: nobody will fetch the file.
+        job.file.delete(save=False)
+
+
+def run_in_thread(job_id):
+    try:
+        run(job_id)
+    finally:
+        connection.close()
+
+
+def process_pending(limit=None):
+    """Run pending jobs oldest first, return how many were processed."""
+    pending = ShoppingListJob.objects.filter(
+        status=ShoppingListJob.PENDING
+    ).values_list('id', flat=True)
+    processed = 0
+    for job_id in pending[:limit] if limit else pending:
+        run(job_id)
+        processed += 1
+    return processed
+
+
+def stale_cutoff():
+    return timezone.now() - datetime.timedelta(
+        seconds=settings.SHOPPING_LIST_JOBS_TIMEOUT
+    )
+
+
+def stale(jobs):
+    """Unfinished ``jobs`` whose worker is presumed dead."""
+    cutoff = stale_cutoff()
+    condition = Q(status=ShoppingListJob.RUNNING, started__lt=cutoff)
+    if settings.SHOPPING_LIST_JOBS_MODE == 'thread':
+        condition |= Q(status=ShoppingListJob.PENDING, created__lt=cutoff)
+    return jobs.filter(condition)
+
+
+def is_stale(job):
+    cutoff = stale_cutoff()
+    if job.status == ShoppingListJob.RUNNING:
+        return job.started < cutoff
+    return (
+        job.status == ShoppingListJob.PENDING
+        and settings.SHOPPING_LIST_JOBS_MODE == 'thread'
+        and job.created < cutoff
+    )
+
+
+def fail_stale(jobs=None):
+    """Fail the stale ones of ``jobs`` (all jobs by default).
+
+    Returns how many were failed.
+    """
+    if jobs is None:
+        jobs = ShoppingListJob.objects.all()
+    return stale(jobs).update(
+        status=ShoppingListJob.FAILED, error=STALE_ERROR,
+        finished=timezone.now(),
+    )
+
+
+def fail_if_stale(job):
+    """``fail_stale`` for one loaded job, no query while it is fresh."""
+    if is_stale(job) and fail_stale(
+        ShoppingListJob.objects.filter(id=job.id)
+    ):
+        job.refresh_from_db()
+
+
+def purge(older_than):
+    """Delete finished jobs and their files older than ``older_than``."""
+    jobs = ShoppingListJob.objects.filter(
+        finished__lt=timezone.now() - older_than
+    )
+    for job in jobs.iterator():
+        job.file.delete(save=False)
+    return jobs.delete()[0]
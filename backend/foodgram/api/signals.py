@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.models import User
+
+from . import authentication
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    authentication.invalidate([instance.key])
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """Deactivation and password changes revoke cached lookups."""
+    if created:
+        return
+    authentication.invalidate(
+        Token.objects.filter(user_id=instance.pk).values_list('key', flat=True)
+    )
@@ -0,0 +1,82 @@
+"""Fixtures shared by the API tests."""
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from users.models import User
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAIAAAACCAIAAAD91JpzAAAA'
+    'FklEQVR4nGP8z8DAwMDAxMDAwMDAAAANHQEDasKb6QAAAABJRU5ErkJggg=='
+)
+PASSWORD = 'Foodgram-User-1'
+
+
+def create_user(username, **fields):
+    """User ``<username>@foodgram.ru`` with the password ``PASSWORD``."""
+    fields = {
+        'email': f'{username}@foodgram.ru',
+        'first_name': 'Имя',
+        'last_name': 'Фамилия',
+        'password': PASSWORD,
+        **fields,
+    }
+    return User.objects.create_user(username=username, **fields)
+
+
+def client_for(user=None):
+    """API client authenticated as ``user``, anonymous without one."""
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    return client
+
+
+def recipe_payload(ingredient_amounts, tag_ids=(), name='Рецепт',
+                   image=IMAGE):
+    """Recipe create and update body for {ingredient id: amount}."""
+    return {
+        'ingredients': [
+            {'id': ingredient_id, 'amount': amount}
+            for ingredient_id, amount in ingredient_amounts.items()
+        ],
+        'tags': list(tag_ids),
+        'image': image,
+        'name': name,
+        'text': 'Описание',
+        'cooking_time': 10,
+    }
+
+
+class APITestCase(TestCase):
+    """Test case with its own ``MEDIA_ROOT`` and an empty cache per test.
+
+    The media directory is removed with the class, so uploads of one
+    test module do not leak into the next one or into the project.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls.media_settings.disable()
+            shutil.rmtree(cls.media_root, ignore_errors=True)
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            super().tearDownClass()
+        finally:
+            cls.media_settings.disable()
+            shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
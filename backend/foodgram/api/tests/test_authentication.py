@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+
+from .base import APITestCase, client_for, create_user
+
+
+class CachedTokenAuthenticationTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        self.token = Token.objects.create(user=self.user)
+        self.client = client_for()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def me(self):
+        return self.client.get(reverse('api:users-me'))
+
+    def assertCachedLookup(self):
+        self.assertEqual(self.me().status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.me()
+        self.assertEqual(response.data['username'], 'reader')
+
+    def test_lookups_are_cached(self):
+        self.assertCachedLookup()
+
+    def test_logout_revokes_token(self):
+        self.assertCachedLookup()
+        self.assertEqual(
+            self.client.post(reverse('api:logout')).status_code, 204
+        )
+        self.assertEqual(self.me().status_code, 401)
+
+    def test_deactivation_revokes_token(self):
+        self.assertCachedLookup()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.me().status_code, 401)
+
+    def test_password_change_revokes_cached_user(self):
+        self.assertCachedLookup()
+        response = self.client.post(reverse('api:users-set-password'), {
+            'new_password': 'Foodgram-Reader-2',
+            'current_password': 'Foodgram-Reader-1',
+        })
+        self.assertEqual(response.status_code, 204)
+        with self.assertNumQueries(1):
+            self.me()
+
+    @override_settings(
+        TOKEN_AUTH_CACHE=dict(settings.TOKEN_AUTH_CACHE, SHARED=True)
+    )
+    def test_shared_cache_revokes_other_workers(self):
+        self.assertCachedLookup()
+        # Another worker has its own LRU but the same shared cache.
+        token_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.me().status_code, 200)
+        worker_entry = token_cache.get(self.token.key)
+        Token.objects.filter(key=self.token.key).delete()
+        token_cache.set(self.token.key, worker_entry)
+        self.assertEqual(self.me().status_code, 401)
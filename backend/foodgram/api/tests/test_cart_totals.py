@@ -0,0 +1,82 @@
+from django.urls import reverse
+
+from api.shopping_list import get_rows
+from core import cart_totals
+from recipes.models import CartIngredient, Ingredient
+
+from .base import APITestCase, client_for, create_user, recipe_payload
+
+
+class CartTotalsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.buyer = create_user('buyer')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(4)
+        )
+
+    def recipe_payload(self, amounts):
+        return recipe_payload({
+            self.ingredients[index].id: amount
+            for index, amount in amounts.items()
+        })
+
+    def create_recipe(self, amounts):
+        response = client_for(self.author).post(
+            reverse('api:recipes-list'), self.recipe_payload(amounts),
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def toggle_cart(self, method, recipe_id):
+        response = getattr(client_for(self.buyer), method)(
+            reverse('api:recipes-shopping-cart', kwargs={'pk': recipe_id})
+        )
+        self.assertLess(response.status_code, 400)
+
+    def assertTotals(self, expected):
+        self.assertEqual(cart_totals.rebuild(fix=False), 0)
+        self.assertEqual(
+            {name: amount for name, amount, _ in get_rows(self.buyer)},
+            {
+                self.ingredients[index].name: amount
+                for index, amount in expected.items()
+            },
+        )
+
+    def test_cart_changes_keep_totals_in_sync(self):
+        first = self.create_recipe({0: 100, 1: 50})
+        second = self.create_recipe({1: 25, 2: 10})
+        self.toggle_cart('post', first)
+        self.toggle_cart('post', second)
+        self.assertTotals({0: 100, 1: 75, 2: 10})
+
+        response = client_for(self.author).patch(
+            reverse('api:recipes-detail', kwargs={'pk': second}),
+            self.recipe_payload({1: 5, 3: 7}), format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertTotals({0: 100, 1: 55, 3: 7})
+
+        self.toggle_cart('delete', first)
+        self.assertTotals({1: 5, 3: 7})
+
+        response = client_for(self.author).delete(
+            reverse('api:recipes-detail', kwargs={'pk': second})
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertTotals({})
+
+    def test_rebuild_repairs_drift(self):
+        recipe = self.create_recipe({0: 100, 1: 50})
+        self.toggle_cart('post', recipe)
+        CartIngredient.objects.filter(
+            ingredient=self.ingredients[0]
+        ).update(total_amount=1)
+        CartIngredient.objects.filter(ingredient=self.ingredients[1]).delete()
+        self.assertEqual(cart_totals.rebuild(), 2)
+        self.assertTotals({0: 100, 1: 50})
@@ -0,0 +1,163 @@
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+
+from api.views import RecipeViewSet
+from core.counters import change_counter, recount
+from recipes.models import Favorite, Ingredient, Recipe
+from users.models import User
+
+from .base import APITestCase, client_for, create_user, recipe_payload
+
+
+@override_settings(RECIPE_THUMBNAILS_MODE='sync')
+class CountersTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.readers = [create_user(f'reader{index}') for index in range(2)]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Пирог', image='static/recipes/pie.png',
+            text='Описание', cooking_time=30,
+        )
+        User.objects.filter(id=cls.author.id).update(recipes_count=1)
+
+    def call(self, user, method, name, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(client_for(user), method)(
+                reverse(f'api:{name}', kwargs=kwargs), format='json'
+            )
+
+    def counters(self):
+        recipe = Recipe.objects.get(id=self.recipe.id)
+        author = User.objects.get(id=self.author.id)
+        return (
+            recipe.favorites_count, recipe.carts_count,
+            author.recipes_count, author.followers_count,
+        )
+
+    def test_memberships_move_counters(self):
+        first, second = self.readers
+        for name, position in (
+            ('recipes-favorite', 0), ('recipes-shopping-cart', 1)
+        ):
+            with self.subTest(name=name):
+                for user, method, status_code, count in (
+                    (first, 'post', 201, 1),
+                    # Repeated requests change nothing.
+                    (first, 'post', 201, 1),
+                    (second, 'post', 201, 2),
+                    (first, 'delete', 204, 1),
+                    (first, 'delete', 204, 1),
+                    (second, 'delete', 204, 0),
+                ):
+                    response = self.call(
+                        user, method, name, pk=self.recipe.id
+                    )
+                    self.assertEqual(response.status_code, status_code)
+                    self.assertEqual(self.counters()[position], count)
+
+    def test_follows_move_counters(self):
+        first, second = self.readers
+        for user, method, status_code, count in (
+            (first, 'post', 201, 1),
+            (first, 'post', 400, 1),
+            (second, 'post', 201, 2),
+            (first, 'delete', 204, 1),
+            (first, 'delete', 400, 1),
+        ):
+            response = self.call(
+                user, method, 'users-subscribe', pk=self.author.id
+            )
+            self.assertEqual(response.status_code, status_code)
+            self.assertEqual(self.counters()[3], count)
+
+    def test_recipes_move_counters(self):
+        ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client_for(self.author).post(
+                reverse('api:recipes-list'),
+                recipe_payload({ingredient.id: 100}), format='json',
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.counters()[2], 2)
+        response = self.call(
+            self.author, 'delete', 'recipes-detail', pk=response.data['id']
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.counters()[2], 1)
+
+    def test_counters_do_not_go_below_zero(self):
+        Favorite.objects.create(user=self.readers[0], recipe=self.recipe)
+        response = self.call(
+            self.readers[0], 'delete', 'recipes-favorite', pk=self.recipe.id
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.counters()[0], 0)
+        change_counter(
+            User.objects.filter(id=self.author.id), 'recipes_count', -5
+        )
+        self.assertEqual(self.counters()[2], 0)
+
+    def test_saves_keep_concurrent_counter_changes(self):
+        get_object = RecipeViewSet.get_object
+
+        def load_then_favorite(view):
+            recipe = get_object(view)
+            # Another request counts a favorite after the recipe is loaded.
+            change_counter(
+                Recipe.objects.filter(id=recipe.id), 'favorites_count', 1
+            )
+            return recipe
+
+        with mock.patch.object(
+            RecipeViewSet, 'get_object', load_then_favorite
+        ):
+            response = client_for(self.author).patch(
+                reverse('api:recipes-detail', kwargs={'pk': self.recipe.id}),
+                {'name': 'Новый пирог'}, format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counters()[0], 1)
+        self.assertEqual(
+            Recipe.objects.get(id=self.recipe.id).name, 'Новый пирог'
+        )
+        author = User.objects.get(id=self.author.id)
+        change_counter(
+            User.objects.filter(id=self.author.id), 'followers_count', 1
+        )
+        author.first_name = 'Автор'
+        author.save()
+        self.assertEqual(self.counters()[2:], (1, 1))
+        self.assertEqual(
+            User.objects.get(id=self.author.id).first_name, 'Автор'
+        )
+
+    def test_recount_repairs_drift(self):
+        Favorite.objects.bulk_create(
+            Favorite(user=user, recipe=self.recipe) for user in self.readers
+        )
+        Recipe.objects.filter(id=self.recipe.id).update(carts_count=3)
+        User.objects.filter(id=self.author.id).update(
+            recipes_count=0, followers_count=4
+        )
+        self.assertEqual(recount(fix=False), {
+            'recipe.favorites_count': 1,
+            'recipe.carts_count': 1,
+            'user.recipes_count': 1,
+            'user.followers_count': 1,
+        })
+        self.assertEqual(self.counters(), (0, 3, 0, 4))
+        stdout = io.StringIO()
+        call_command('recount_counters', stdout=stdout)
+        self.assertIn(
+            'recipe.favorites_count: расхождений 1', stdout.getvalue()
+        )
+        self.assertEqual(self.counters(), (2, 0, 1, 0))
+        self.assertEqual(set(recount(fix=False).values()), {0})
@@ -0,0 +1,131 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from core.ingredient_import import (import_ingredients, iter_json_array,
+                                    read_ingredients)
+from recipes.models import Ingredient
+
+from .base import APITestCase
+
+ITEMS = [
+    {'name': 'соль "морская"', 'measurement_unit': 'г'},
+    {'name': 'соус [острый] {чили}', 'measurement_unit': 'ст. л.'},
+    {'name': 'ром\\ваниль]', 'measurement_unit': 'мл'},
+    {'name': 'вода', 'measurement_unit': 'л', 'extra': [1, {']': '['}]},
+]
+
+
+class TemporaryFilesMixin:
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf8') as file:
+            file.write(text)
+        return path
+
+
+class IterJsonArrayTest(TemporaryFilesMixin, SimpleTestCase):
+
+    def parse(self, text, chunk_sizes=(1, 2, 3, 7, 64, 64 * 1024)):
+        path = self.write('items.json', text)
+        results = {
+            chunk_size: list(iter_json_array(path, chunk_size))
+            for chunk_size in chunk_sizes
+        }
+        first = results[chunk_sizes[0]]
+        for chunk_size, items in results.items():
+            self.assertEqual(items, first, f'chunk_size={chunk_size}')
+        return first
+
+    def test_items_split_across_chunks(self):
+        for indent in (None, 2):
+            with self.subTest(indent=indent):
+                self.assertEqual(
+                    self.parse(json.dumps(
+                        ITEMS, ensure_ascii=False, indent=indent
+                    )),
+                    ITEMS,
+                )
+
+    def test_scalars_split_across_chunks(self):
+        self.assertEqual(
+            self.parse('[12345, -6.5e3, true, null, "1,2"]'),
+            [12345, -6500.0, True, None, '1,2'],
+        )
+
+    def test_empty_arrays(self):
+        for text in ('[]', '  [ \n ]  ', '\n\n\n   [\n]'):
+            with self.subTest(text=text):
+                self.assertEqual(self.parse(text), [])
+
+    def test_invalid_documents(self):
+        for text, error in (
+            ('{"name": "соль"}', ValueError),
+            ('', ValueError),
+            ('[{"name": "соль"}', json.JSONDecodeError),
+            ('[{"name": "соль"', json.JSONDecodeError),
+            ('[{"name": "соль"}, }]', json.JSONDecodeError),
+            ('[,{"name": "соль"}]', json.JSONDecodeError),
+            ('[{"name": "соль"},,{"name": "мёд"}]', json.JSONDecodeError),
+            ('[{"name": "соль"},]', json.JSONDecodeError),
+            ('[ {"name": "соль"} \n ]  x', None),
+            ('[1 2]', json.JSONDecodeError),
+            ('[,]', json.JSONDecodeError),
+            ('[1,', json.JSONDecodeError),
+        ):
+            for chunk_size in (1, 5, 64 * 1024):
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    path = self.write('items.json', text)
+                    if error is None:
+                        # Whatever follows the array is not read.
+                        self.assertEqual(
+                            list(iter_json_array(path, chunk_size)),
+                            [{'name': 'соль'}],
+                        )
+                        continue
+                    with self.assertRaises(error):
+                        list(iter_json_array(path, chunk_size))
+
+
+class ImportIngredientsTest(TemporaryFilesMixin, APITestCase):
+
+    def test_read_formats(self):
+        fixture = [
+            {'model': 'recipes.tag', 'pk': 1, 'fields': {'name': 'Обед'}},
+            {
+                'model': 'recipes.ingredient', 'pk': 1,
+                'fields': {'name': ' мука ', 'measurement_unit': 'г'},
+            },
+        ]
+        for name, text, expected in (
+            ('items.json', json.dumps(ITEMS[:2]), [
+                ('соль "морская"', 'г'), ('соус [острый] {чили}', 'ст. л.'),
+            ]),
+            ('fixture.json', json.dumps(fixture), [('мука', 'г')]),
+            (
+                'items.csv',
+                'name,measurement_unit\n"соль, морская",г\n ,г\nмёд\n',
+                [('соль, морская', 'г')],
+            ),
+        ):
+            with self.subTest(name=name):
+                self.assertEqual(
+                    list(read_ingredients(self.write(name, text))), expected
+                )
+        with self.assertRaises(ValueError):
+            list(read_ingredients(self.write('items.xml', '')))
+
+    def test_import_skips_existing(self):
+        path = self.write('items.json', json.dumps(ITEMS))
+        self.assertEqual(import_ingredients(path, batch_size=3)[:2], (4, 4))
+        self.assertEqual(import_ingredients(path)[:2], (4, 0))
+        self.assertEqual(Ingredient.objects.count(), 4)
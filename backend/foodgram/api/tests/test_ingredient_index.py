@@ -0,0 +1,37 @@
+from django.test import SimpleTestCase
+
+from recipes.ingredient_index import IngredientIndex
+
+
+class IngredientIndexTest(SimpleTestCase):
+
+    def setUp(self):
+        # (id, name, measurement unit, popularity)
+        self.index = IngredientIndex([
+            (1, 'Сахар', 'г', 5),
+            (2, 'сахарная пудра', 'г', 9),
+            (3, 'ванильный сахар', 'г', 2),
+            (4, 'тростниковый сахар', 'г', 7),
+            (5, 'соль', 'г', 20),
+        ])
+
+    def names(self, query, limit=None):
+        return [item['name'] for item in self.index.search(query, limit)]
+
+    def test_prefix_matches_go_first_by_popularity(self):
+        self.assertEqual(self.names('сахар'), [
+            'сахарная пудра', 'Сахар', 'тростниковый сахар',
+            'ванильный сахар',
+        ])
+
+    def test_substring_offsets(self):
+        # The first and the last name of the joined names are found too.
+        self.assertEqual(self.names('оль'), ['соль'])
+        self.assertEqual(self.names('ильный'), ['ванильный сахар'])
+        self.assertEqual(self.names('ахар', limit=2), [
+            'сахарная пудра', 'тростниковый сахар',
+        ])
+
+    def test_empty_and_multiline_queries(self):
+        self.assertEqual(self.names(''), [])
+        self.assertEqual(self.names('соль\nсахар'), [])
@@ -0,0 +1,75 @@
+from unittest import mock
+
+from django.conf import settings
+from django.urls import reverse
+
+from recipes.models import Ingredient, Tag
+
+from .base import APITestCase, client_for
+
+
+class ListCacheTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('мука', 'мёд', 'соль')
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for()
+
+    def get(self, url, query=None, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, query, **headers)
+
+    def test_not_modified(self):
+        url = reverse('api:tags-list')
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.get(url, etag=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+        response = self.get(url, etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data), 2)
+
+    def test_key_ignores_other_query_params(self):
+        url = reverse('api:ingredients-list')
+        etag = self.get(url, {'name': 'м'})['ETag']
+        for query in (
+            {'name': 'М'}, {'name': 'м', 'nocache': '123'},
+            {'nocache': '1', 'name': 'м'},
+        ):
+            with self.subTest(query=query):
+                self.assertEqual(self.get(url, query)['ETag'], etag)
+        for query in ({'name': 'мё'}, {}):
+            with self.subTest(query=query):
+                self.assertNotEqual(self.get(url, query)['ETag'], etag)
+        self.assertEqual(
+            self.get(reverse('api:tags-list'), {'page': 2})['ETag'],
+            self.get(reverse('api:tags-list'))['ETag'],
+        )
+
+    def test_entries_expire(self):
+        self.assertLessEqual(
+            settings.LIST_CACHE_TIMEOUT, settings.INGREDIENT_INDEX_TTL
+        )
+        with mock.patch('api.mixins.cache') as cache:
+            cache.get.return_value = None
+            response = self.get(reverse('api:ingredients-list'), {
+                'name': 'мук'
+            })
+        self.assertEqual(
+            [ingredient['name'] for ingredient in response.data], ['мука']
+        )
+        cache.set.assert_called_once_with(
+            mock.ANY, response.data, settings.LIST_CACHE_TIMEOUT
+        )
@@ -0,0 +1,84 @@
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from core.checks import check_shared_cache
+from core.membership_sets import IdSet
+from recipes.models import Recipe
+
+from .base import APITestCase, client_for, create_user
+
+
+class IdSetTest(SimpleTestCase):
+
+    def test_membership(self):
+        ids = IdSet.from_ids([7, 3, 2 ** 40, 11])
+        self.assertEqual(ids.ids.typecode, 'Q')
+        self.assertEqual(len(ids), 4)
+        for pk in (3, 7, 11, 2 ** 40):
+            self.assertIn(pk, ids)
+        for pk in (0, 4, 12, 2 ** 41):
+            self.assertNotIn(pk, ids)
+        self.assertEqual(
+            list(IdSet.unpack(IdSet.from_ids([5, 1]).pack()).ids), [1, 5]
+        )
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+
+    def test_process_local_cache_is_reported(self):
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)], ['core.W001']
+        )
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': 'cache:11211',
+        }}):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class MembershipFlagsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Пирог', image='static/recipes/pie.png',
+            text='Описание', cooking_time=30,
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for(self.reader)
+
+    def flags(self):
+        data = self.client.get(
+            reverse('api:recipes-detail', kwargs={'pk': self.recipe.id})
+        ).data
+        return (
+            data['is_favorited'], data['is_in_shopping_cart'],
+            data['author']['is_subscribed'],
+        )
+
+    def toggle(self, method, name, pk):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(
+                reverse(f'api:{name}', kwargs={'pk': pk})
+            )
+        self.assertLess(response.status_code, 400)
+
+    def test_flags_follow_changes(self):
+        self.assertEqual(self.flags(), (False, False, False))
+        self.toggle('post', 'recipes-favorite', self.recipe.id)
+        self.assertEqual(self.flags(), (True, False, False))
+        self.toggle('post', 'recipes-shopping-cart', self.recipe.id)
+        self.toggle('post', 'users-subscribe', self.author.id)
+        self.assertEqual(self.flags(), (True, True, True))
+        self.toggle('delete', 'recipes-favorite', self.recipe.id)
+        self.toggle('delete', 'users-subscribe', self.author.id)
+        self.assertEqual(self.flags(), (False, True, False))
+
+    def test_anonymous_reader_needs_no_sets(self):
+        self.client.force_authenticate(None)
+        with self.assertNumQueries(3):
+            self.assertEqual(self.flags(), (False, False, False))
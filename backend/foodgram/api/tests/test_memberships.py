@@ -0,0 +1,110 @@
+from django.urls import reverse
+
+from api.serializers import RecipeIdsSerializer
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+from .base import APITestCase, client_for, create_user
+
+
+class BulkMembershipTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        cls.recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=cls.author, name=f'Рецепт {index}', text='Описание',
+                image='static/recipes/dish.png', cooking_time=10,
+            )
+            for index in range(RecipeIdsSerializer.MAX_RECIPES + 1)
+        )
+        cls.ids = [recipe.id for recipe in cls.recipes]
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for(self.reader)
+
+    def bulk(self, method, name, recipe_ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(
+                reverse(f'api:recipes-{name}-bulk'),
+                {'recipes': recipe_ids}, format='json',
+            )
+
+    def members(self, model):
+        return set(model.objects.filter(user=self.reader).values_list(
+            'recipe_id', flat=True
+        ))
+
+    def test_add_and_remove(self):
+        for name, model in (
+            ('favorite', Favorite), ('shopping-cart', ShoppingCart)
+        ):
+            with self.subTest(name=name):
+                first, second, third = self.ids[:3]
+                response = self.bulk('post', name, [second, first, first])
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(
+                    [recipe['id'] for recipe in response.data],
+                    [first, second],
+                )
+                self.assertEqual(
+                    set(response.data[0]),
+                    {'id', 'name', 'image', 'image_srcset', 'cooking_time'},
+                )
+                # Adding present recipes again changes nothing.
+                response = self.bulk('post', name, [first, second, third])
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(len(response.data), 3)
+                self.assertEqual(
+                    self.members(model), {first, second, third}
+                )
+                response = self.bulk('delete', name, [first, third])
+                self.assertEqual(response.status_code, 204)
+                self.assertEqual(self.members(model), {second})
+                # So does removing absent ones.
+                response = self.bulk('delete', name, [first, second])
+                self.assertEqual(response.status_code, 204)
+                self.assertEqual(self.members(model), set())
+
+    def test_unknown_recipes(self):
+        unknown = [max(self.ids) + 2, max(self.ids) + 1]
+        response = self.bulk('post', 'favorite', [self.ids[0], *unknown])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(sorted(unknown)), str(response.data['recipes']))
+        self.assertEqual(self.members(Favorite), set())
+
+    def test_remove_skips_deleted_recipes(self):
+        first, second = self.ids[:2]
+        self.bulk('post', 'shopping-cart', [first, second])
+        Recipe.objects.filter(id=first).delete()
+        response = self.bulk(
+            'delete', 'shopping-cart', [first, second, max(self.ids) + 1]
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.members(ShoppingCart), set())
+
+    def test_invalid_lists(self):
+        for recipe_ids in ([], [0], ['пирог'], 5):
+            with self.subTest(recipe_ids=recipe_ids):
+                response = self.bulk('post', 'shopping-cart', recipe_ids)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('recipes', response.data)
+        self.assertEqual(self.members(ShoppingCart), set())
+
+    def test_recipes_limit(self):
+        limit = RecipeIdsSerializer.MAX_RECIPES
+        response = self.bulk('post', 'favorite', self.ids)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('recipes', response.data)
+        self.assertEqual(self.members(Favorite), set())
+        response = self.bulk('post', 'favorite', self.ids[:limit])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.members(Favorite)), limit)
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(
+            self.bulk('post', 'favorite', self.ids[:1]).status_code, 401
+        )
@@ -0,0 +1,157 @@
+from django.db import connection
+from django.urls import reverse
+
+from recipes import postings
+from recipes.models import (Ingredient, IngredientPosting, Recipe,
+                            RecipeIngredient)
+
+from .base import APITestCase, client_for, create_user, recipe_payload
+
+
+class IngredientFiltersTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.egg, cls.milk, cls.flour, cls.salt = (
+            Ingredient.objects.bulk_create(
+                Ingredient(name=name, measurement_unit='г')
+                for name in ('яйца', 'молоко', 'мука', 'соль')
+            )
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for(self.author)
+        self.omelette = self.create('Омлет', self.egg, self.milk, self.salt)
+        self.pancakes = self.create(
+            'Блины', self.egg, self.milk, self.flour
+        )
+        self.bread = self.create('Хлеб', self.flour, self.salt)
+
+    def create(self, name, *ingredients):
+        response = self.client.post(
+            reverse('api:recipes-list'),
+            recipe_payload(
+                {ingredient.id: 10 for ingredient in ingredients}, name=name
+            ),
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def list(self, **query):
+        response = self.client.get(reverse('api:recipes-list'), {
+            key: ','.join(map(str, value)) if isinstance(value, list)
+            else value
+            for key, value in query.items()
+        })
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def found(self, **query):
+        return [recipe['id'] for recipe in self.list(**query).data['results']]
+
+    def test_filters(self):
+        egg, milk, flour, salt = (
+            self.egg.id, self.milk.id, self.flour.id, self.salt.id
+        )
+        self.assertEqual(
+            self.found(ingredients=[egg, milk]),
+            [self.pancakes, self.omelette],
+        )
+        self.assertEqual(
+            self.found(ingredients=[egg, milk], exclude_ingredients=[salt]),
+            [self.pancakes],
+        )
+        self.assertEqual(
+            self.found(exclude_ingredients=[milk]), [self.bread]
+        )
+        self.assertEqual(
+            self.found(ingredients=[egg, flour, salt], max_missing=1),
+            [self.bread, self.pancakes, self.omelette],
+        )
+        self.assertEqual(
+            self.found(ingredients=[milk, flour], max_missing=1, limit=2),
+            [self.pancakes, self.bread],
+        )
+        self.assertEqual(
+            self.client.get(
+                reverse('api:recipes-list'), {'max_missing': -1}
+            ).status_code,
+            400,
+        )
+
+    def test_index_follows_recipe_writes(self):
+        url = reverse('api:recipes-detail', kwargs={'pk': self.bread})
+        response = self.client.patch(url, {'ingredients': [
+            {'id': self.flour.id, 'amount': 500},
+            {'id': self.milk.id, 'amount': 200},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.found(ingredients=[self.milk.id]),
+            [self.bread, self.pancakes, self.omelette],
+        )
+        self.assertEqual(self.found(ingredients=[self.salt.id]), [
+            self.omelette
+        ])
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.found(ingredients=[self.flour.id]), [
+            self.pancakes
+        ])
+        self.assertEqual(postings.rebuild(fix=False), 0)
+
+    def test_rebuild_repairs_drift(self):
+        IngredientPosting.objects.filter(ingredient=self.salt).delete()
+        IngredientPosting.objects.filter(ingredient=self.egg).update(
+            recipe_ids=postings.encode([1])
+        )
+        self.assertEqual(postings.rebuild(fix=False), 2)
+        self.assertEqual(postings.rebuild(), 2)
+        self.assertEqual(postings.rebuild(), 0)
+        self.assertEqual(
+            self.found(ingredients=[self.salt.id, self.egg.id]),
+            [self.omelette],
+        )
+
+    def test_queries_do_not_list_every_found_recipe(self):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=self.author, name=f'Яичница {index}', text='Описание',
+                image='static/recipes/dish.png', cooking_time=5,
+            )
+            for index in range(500)
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=self.egg, amount=2)
+            for recipe in recipes
+        )
+        postings.rebuild()
+        for query, count in (
+            ({'ingredients': [self.egg.id, self.milk.id], 'max_missing': 1},
+             502),
+            ({'exclude_ingredients': [self.egg.id]}, 1),
+        ):
+            with self.subTest(query=query):
+                statements = []
+
+                def record(execute, sql, params, many, context):
+                    statements.append((sql, params))
+                    return execute(sql, params, many, context)
+
+                with connection.execute_wrapper(record):
+                    response = self.list(limit=2, **query)
+                self.assertEqual(response.data['count'], count)
+                for sql, params in statements:
+                    self.assertLess(len(sql), 2000)
+                    self.assertLess(len(params or ()), 50)
+                    # Found from the postings, not RecipeIngredient.
+                    if 'json_each' in sql:
+                        self.assertNotIn('recipeingredient', sql)
+                self.assertTrue(any(
+                    'json_each' in sql for sql, _ in statements
+                ))
+        self.assertEqual(self.found(
+            ingredients=[self.egg.id, self.milk.id], max_missing=1, limit=3
+        ), [self.pancakes, self.omelette, recipes[-1].id])
@@ -0,0 +1,256 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.query_budgets import QUERY_BUDGETS
+from api.urls import router_v1
+from core import cart_totals, timelines, trending
+from core.dataset import PRESETS, generate_dataset, max_id, new_ids
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListJob, Tag)
+from users.models import Follow, User
+
+from .base import APITestCase, client_for, create_user, recipe_payload
+
+# (route name, url kwargs, query string, paginated)
+READ_CASES = (
+    ('api-root', {}, '', False),
+    ('ingredients-list', {}, '', False),
+    ('ingredients-list', {}, 'name=ингредиент 1', False),
+    ('ingredients-detail', {'pk': 'ingredient'}, '', False),
+    ('tags-list', {}, '', False),
+    ('tags-detail', {'pk': 'tag'}, '', False),
+    ('recipes-list', {}, '', True),
+    ('recipes-list', {}, 'pagination=cursor', True),
+    ('recipes-list', {}, 'tags=breakfast&tags=lunch', True),
+    ('recipes-list', {}, 'author={author}', True),
+    ('recipes-list', {}, 'is_favorited=1', True),
+    ('recipes-list', {}, 'is_in_shopping_cart=1', True),
+    ('recipes-list', {}, 'is_favorited=1&is_in_shopping_cart=1&tags=lunch',
+     True),
+    ('recipes-list', {}, 'search=домашние супы', True),
+    ('recipes-list', {}, 'search=суп&tags=lunch&is_favorited=1', True),
+    ('recipes-list', {},
+     'ingredients={ingredient},{other_ingredient}&max_missing=1', True),
+    ('recipes-list', {}, 'exclude_ingredients={ingredient}&tags=lunch', True),
+    ('recipes-list', {}, 'ordering=trending', True),
+    ('recipes-list', {}, 'ordering=trending&tags=lunch&author={author}',
+     True),
+    ('recipes-feed', {}, '', True),
+    ('recipes-detail', {'pk': 'recipe'}, '', False),
+    ('recipes-similar', {'pk': 'recipe'}, '', False),
+    ('recipes-download-shopping-cart', {}, '', False),
+    ('recipes-download-shopping-cart', {}, 'format=csv', False),
+    ('recipes-download-shopping-cart', {}, 'format=json', False),
+    ('recipes-download-shopping-cart', {}, 'async=1', False),
+    ('recipes-download-shopping-cart-job', {'job_id': 'job'}, '', False),
+    ('users-list', {}, '', True),
+    ('users-detail', {'pk': 'author'}, '', False),
+    ('users-me', {}, '', False),
+    ('users-subscriptions', {}, '', True),
+    ('users-subscriptions', {}, 'recipes_limit=2', True),
+    ('users-subscriptions', {}, 'pagination=cursor', True),
+)
+
+# (route name, method, url kwargs); run in this order by one test.
+WRITE_CASES = (
+    ('recipes-list', 'POST', {}),
+    ('recipes-detail', 'PATCH', {'pk': 'new_recipe'}),
+    ('recipes-favorite', 'POST', {'pk': 'new_recipe'}),
+    ('recipes-favorite', 'DELETE', {'pk': 'new_recipe'}),
+    ('recipes-shopping-cart', 'POST', {'pk': 'new_recipe'}),
+    ('recipes-shopping-cart', 'DELETE', {'pk': 'new_recipe'}),
+    ('recipes-favorite-bulk', 'POST', {}),
+    ('recipes-favorite-bulk', 'DELETE', {}),
+    ('recipes-shopping-cart-bulk', 'POST', {}),
+    ('recipes-shopping-cart-bulk', 'DELETE', {}),
+    ('recipes-detail', 'DELETE', {'pk': 'new_recipe'}),
+    ('users-subscribe', 'DELETE', {'pk': 'author'}),
+    ('users-subscribe', 'POST', {'pk': 'author'}),
+    ('users-list', 'POST', {}),
+    ('users-set-password', 'POST', {}),
+)
+
+
+def seed_dataset(reader, seed):
+    """Add a small synthetic dataset and relate the reader to it."""
+    last_user, last_recipe = max_id(User), max_id(Recipe)
+    generate_dataset(**PRESETS['small'], seed=seed)
+    recipes = new_ids(Recipe, last_recipe)
+    Follow.objects.bulk_create(
+        Follow(user=reader, author_id=author_id)
+        for author_id in User.objects.filter(
+            id__gt=last_user, recipes__isnull=False
+        ).values_list('id', flat=True).distinct()
+    )
+    Favorite.objects.bulk_create(
+        Favorite(user=reader, recipe_id=recipe_id)
+        for recipe_id in recipes[::2]
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=reader, recipe_id=recipe_id)
+        for recipe_id in recipes[::3]
+    )
+    cart_totals.rebuild()
+    timelines.rebuild()
+    trending.refresh()
+
+
+class QueryBudgetTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(
+            'reader', first_name='Читатель', last_name='Тестовый',
+            password='Foodgram-Reader-1',
+        )
+        seed_dataset(cls.user, seed=0)
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for(self.user)
+        self.objects = {
+            'author': self.user.follower.first().author,
+            'ingredient': Ingredient.objects.first(),
+            'other_ingredient': Ingredient.objects.last(),
+            'tag': Tag.objects.first(),
+            'recipe': Recipe.objects.first(),
+            'job': ShoppingListJob.objects.create(user=self.user),
+        }
+
+    def url(self, name, kwargs, query=''):
+        kwargs = {key: self.objects[value].id for key, value in kwargs.items()}
+        query = query.format(**{
+            key: value.id for key, value in self.objects.items()
+        })
+        url = reverse(f'api:{name}', kwargs=kwargs)
+        return f'{url}?{query}' if query else url
+
+    def count_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method.lower())(
+                url, data, format='json'
+            )
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, (method, url, response))
+        return len(context), response
+
+    def measure_reads(self, limit):
+        counts = {}
+        for name, kwargs, query, paginated in READ_CASES:
+            full_query = query
+            if paginated:
+                full_query = '&'.join(filter(None, (query, f'limit={limit}')))
+            count, _ = self.count_queries(
+                'GET', self.url(name, kwargs, full_query)
+            )
+            self.assertLessEqual(
+                count, QUERY_BUDGETS[name]['GET'],
+                f'GET {name}?{full_query} is over its query budget'
+            )
+            counts[name, query] = count
+        return counts
+
+    def test_cases_cover_budgets(self):
+        routes = {
+            pattern.name for pattern in router_v1.urls
+            if getattr(pattern, 'name', None)
+        }
+        self.assertEqual(routes, set(QUERY_BUDGETS))
+        cases = {(name, 'GET') for name, *_ in READ_CASES}
+        cases |= {(name, method) for name, method, _ in WRITE_CASES}
+        self.assertEqual(cases, {
+            (name, method)
+            for name, methods in QUERY_BUDGETS.items()
+            for method in methods
+        })
+
+    def test_reads_do_not_grow_with_page_size(self):
+        self.measure_reads(10)
+        self.assertEqual(self.measure_reads(2), self.measure_reads(50))
+
+    def test_reads_do_not_grow_with_dataset_size(self):
+        self.measure_reads(10)
+        before = self.measure_reads(10)
+        seed_dataset(self.user, seed=1)
+        self.assertEqual(before, self.measure_reads(10))
+
+    def test_writes_stay_within_budget(self):
+        ingredients = list(
+            Ingredient.objects.values_list('id', flat=True)[:4]
+        )
+        tags = list(Tag.objects.values_list('id', flat=True))
+        recipes = {
+            'recipes': list(Recipe.objects.values_list('id', flat=True)[:10])
+        }
+        payloads = {
+            ('recipes-favorite-bulk', 'POST'): recipes,
+            ('recipes-favorite-bulk', 'DELETE'): recipes,
+            ('recipes-shopping-cart-bulk', 'POST'): recipes,
+            ('recipes-shopping-cart-bulk', 'DELETE'): recipes,
+            ('recipes-list', 'POST'): recipe_payload(
+                dict.fromkeys(ingredients[:3], 10), tags
+            ),
+            # One ingredient and tag removed, one added, the rest changed.
+            ('recipes-detail', 'PATCH'): recipe_payload(
+                dict.fromkeys(ingredients[1:], 20), tags[1:],
+                name='Изменённый рецепт',
+            ),
+            ('users-list', 'POST'): {
+                'email': 'newcomer@foodgram.ru',
+                'username': 'newcomer',
+                'first_name': 'Новый',
+                'last_name': 'Пользователь',
+                'password': 'Foodgram-Newcomer-1',
+            },
+            ('users-set-password', 'POST'): {
+                'new_password': 'Foodgram-Reader-2',
+                'current_password': 'Foodgram-Reader-1',
+            },
+        }
+        for name, method, kwargs in WRITE_CASES:
+            count, response = self.count_queries(
+                method, self.url(name, kwargs), payloads.get((name, method))
+            )
+            self.assertLessEqual(
+                count, QUERY_BUDGETS[name][method],
+                f'{method} {name} is over its query budget'
+            )
+            if (name, method) == ('recipes-list', 'POST'):
+                self.objects['new_recipe'] = Recipe.objects.get(
+                    id=response.data['id']
+                )
+
+    def test_recipe_writes_do_not_grow_with_ingredients(self):
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        tags = list(Tag.objects.values_list('id', flat=True))
+        counts = []
+        for size in (3, 30):
+            post_count, response = self.count_queries(
+                'POST', reverse('api:recipes-list'),
+                recipe_payload(dict.fromkeys(ingredients[:size], 10), tags),
+            )
+            url = reverse(
+                'api:recipes-detail', kwargs={'pk': response.data['id']}
+            )
+            patch_count, _ = self.count_queries(
+                'PATCH', url, recipe_payload(
+                    dict.fromkeys(ingredients[size // 2:size + size // 2], 20),
+                    tags[1:],
+                ),
+            )
+            counts.append((post_count, patch_count))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bulk_memberships_do_not_grow_with_recipe_count(self):
+        recipes = list(Recipe.objects.values_list('id', flat=True))
+        for name in ('recipes-favorite-bulk', 'recipes-shopping-cart-bulk'):
+            counts = []
+            for size in (2, 50):
+                payload = {'recipes': recipes[:size]}
+                counts.append(tuple(
+                    self.count_queries(method, self.url(name, {}), payload)[0]
+                    for method in ('DELETE', 'POST', 'DELETE')
+                ))
+            self.assertEqual(counts[0], counts[1], name)
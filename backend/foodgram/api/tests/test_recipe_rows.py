@@ -0,0 +1,109 @@
+import io
+
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+from api.serializers import GetRecipeSerializer
+from api.views import RecipeViewSet
+from recipes.models import Recipe
+
+from .base import APITestCase, client_for, create_user
+from .test_query_budgets import seed_dataset
+
+
+class RecipeRowsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        seed_dataset(cls.user, seed=0)
+        first, second = Recipe.objects.order_by('-pub_date', '-id')[:2]
+        Recipe.objects.filter(id=first.id).update(thumbnails={
+            'source': first.image.name,
+            'webp': {'300': 'thumbs/a-300.webp', '150': 'thumbs/a-150.webp'},
+            'jpeg': {'150': 'thumbs/a-150.jpeg'},
+        })
+        Recipe.objects.filter(id=second.id).update(image='')
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for(self.user)
+
+    def assertSameAsSerializer(self, response, data):
+        ids = [recipe['id'] for recipe in data]
+        recipes = RecipeViewSet().get_queryset().in_bulk(ids)
+        self.assertEqual(
+            JSONRenderer().render(data),
+            JSONRenderer().render(GetRecipeSerializer(
+                [recipes[pk] for pk in ids], many=True,
+                context={'request': response.renderer_context['request']},
+            ).data),
+        )
+
+    def get_page(self, url, query=None):
+        response = self.client.get(url, query)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'])
+        return response
+
+    def test_list_matches_serializer(self):
+        for query in (
+            {'limit': 50},
+            {'limit': 10, 'pagination': 'cursor'},
+            {'limit': 10, 'is_favorited': 1, 'tags': 'lunch'},
+            {'limit': 10, 'ordering': 'trending'},
+        ):
+            with self.subTest(query=query):
+                response = self.get_page(reverse('api:recipes-list'), query)
+                self.assertSameAsSerializer(
+                    response, response.data['results']
+                )
+        first, second = self.get_page(
+            reverse('api:recipes-list'), {'limit': 2}
+        ).data['results']
+        self.assertEqual(first['image_srcset']['jpeg'].count('http'), 1)
+        self.assertIsNone(second['image'])
+
+    def test_anonymous_list_matches_serializer(self):
+        self.client.force_authenticate(None)
+        response = self.get_page(reverse('api:recipes-list'), {'limit': 20})
+        self.assertSameAsSerializer(response, response.data['results'])
+
+    def test_cursor_pages_follow_each_other(self):
+        first = self.get_page(
+            reverse('api:recipes-list'), {'limit': 5, 'pagination': 'cursor'}
+        ).data
+        second = self.get_page(first['next']).data
+        self.assertEqual(
+            [recipe['id'] for recipe in first['results'] + second['results']],
+            list(Recipe.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )[:10]),
+        )
+
+    def test_feed_matches_serializer(self):
+        response = self.get_page(reverse('api:recipes-feed'), {'limit': 10})
+        self.assertSameAsSerializer(response, response.data['results'])
+
+    def test_detail_matches_serializer(self):
+        for recipe in Recipe.objects.order_by('-pub_date', '-id')[:3]:
+            response = self.client.get(
+                reverse('api:recipes-detail', kwargs={'pk': recipe.id})
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertSameAsSerializer(response, [response.data])
+        self.assertEqual(
+            self.client.get(
+                reverse('api:recipes-detail', kwargs={'pk': 0})
+            ).status_code,
+            404,
+        )
+
+    def test_benchmark_command(self):
+        stdout = io.StringIO()
+        call_command(
+            'benchmark_recipe_serialization', '--sizes', '2', '--seconds',
+            '0', '--user', self.user.email, stdout=stdout,
+        )
+        self.assertIn('page 2:', stdout.getvalue())
@@ -0,0 +1,186 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import cart_totals
+from recipes import postings
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+from .base import APITestCase, client_for, create_user, recipe_payload
+
+
+@override_settings(RECIPE_THUMBNAILS_MODE='sync')
+class RecipeWritesTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.flour, cls.milk, cls.egg, cls.salt = (
+            Ingredient.objects.bulk_create(
+                Ingredient(name=name, measurement_unit='г')
+                for name in ('мука', 'молоко', 'яйца', 'соль')
+            )
+        )
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for(self.author)
+        response = self.client.post(
+            reverse('api:recipes-list'),
+            recipe_payload(
+                {self.flour.id: 200, self.milk.id: 300}, [self.tag.id],
+                name='Блины',
+            ),
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.recipe = Recipe.objects.get(id=response.data['id'])
+        # As after a build of similar recipes.
+        Recipe.objects.filter(id=self.recipe.id).update(
+            similar_outdated=False
+        )
+        self.url = reverse('api:recipes-detail', kwargs={'pk': self.recipe.id})
+
+    def rows(self):
+        return {
+            row.ingredient_id: (row.id, row.amount)
+            for row in RecipeIngredient.objects.filter(recipe=self.recipe)
+        }
+
+    def patch(self, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.recipe.refresh_from_db()
+        return [
+            query['sql'] for query in queries
+            if 'recipes_recipeingredient' in query['sql']
+            and not query['sql'].startswith('SELECT')
+        ]
+
+    def test_invalid_ingredients(self):
+        # Malformed items and amounts below 1 are already rejected by
+        # RecipeIngredientSerializer, the rest by parse_ingredients.
+        unknown = self.salt.id + 100
+        for ingredients, message in (
+            ([], 'Выберите ингредиент!'),
+            ('мука', None),
+            ([{'id': self.flour.id}], None),
+            ([{'amount': 10}], 'Укажите id и количество'),
+            ([{'id': 'мука', 'amount': 10}], 'Укажите id и количество'),
+            ([{'id': self.flour.id, 'amount': 'много'}], None),
+            ([self.flour.id], None),
+            ([{'id': self.flour.id, 'amount': 0}], None),
+            ([{'id': self.flour.id, 'amount': -5}], None),
+            (
+                [
+                    {'id': self.flour.id, 'amount': 10},
+                    {'id': str(self.flour.id), 'amount': 20},
+                ],
+                'не должны повторяться',
+            ),
+            (
+                [
+                    {'id': self.flour.id, 'amount': 10},
+                    {'id': unknown, 'amount': 20},
+                ],
+                f'Несуществующие ингредиенты: [{unknown}]',
+            ),
+        ):
+            with self.subTest(ingredients=ingredients):
+                for method, url in (
+                    ('post', reverse('api:recipes-list')),
+                    ('patch', self.url),
+                ):
+                    data = recipe_payload({}, [self.tag.id])
+                    data['ingredients'] = ingredients
+                    response = getattr(self.client, method)(
+                        url, data, format='json'
+                    )
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('ingredients', response.data)
+                    if message is not None:
+                        self.assertIn(
+                            message, str(response.data['ingredients'])
+                        )
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertEqual(
+            set(self.rows()), {self.flour.id, self.milk.id}
+        )
+
+    def test_invalid_tags(self):
+        unknown = self.tag.id + 100
+        for tags, message in (
+            ([self.tag.id, unknown], f'Несуществующие теги: [{unknown}]'),
+            (['завтрак'], 'Неверный id тега!'),
+            (None, 'Неверный id тега!'),
+            (str(self.tag.id), 'Неверный id тега!'),
+            ({'id': self.tag.id}, 'Неверный id тега!'),
+        ):
+            with self.subTest(tags=tags):
+                data = recipe_payload({self.egg.id: 2})
+                data['tags'] = tags
+                response = self.client.post(
+                    reverse('api:recipes-list'), data, format='json'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(message, str(response.data['tags']))
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_required_on_create_only(self):
+        for field in ('ingredients', 'tags'):
+            with self.subTest(field=field):
+                data = recipe_payload({self.egg.id: 2}, [self.tag.id])
+                del data[field]
+                response = self.client.post(
+                    reverse('api:recipes-list'), data, format='json'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.data)
+        rows = self.rows()
+        self.assertEqual(self.patch({'name': 'Тонкие блины'}), [])
+        self.assertEqual(self.rows(), rows)
+        self.assertEqual(self.recipe.name, 'Тонкие блины')
+        self.assertEqual(
+            list(self.recipe.tags.values_list('id', flat=True)),
+            [self.tag.id],
+        )
+
+    def test_patch_applies_the_difference(self):
+        rows = self.rows()
+        self.assertEqual(self.patch({'ingredients': [
+            {'id': self.milk.id, 'amount': 300},
+            {'id': self.flour.id, 'amount': 200},
+        ]}), [])
+        self.assertEqual(self.rows(), rows)
+        self.assertFalse(self.recipe.similar_outdated)
+
+        writes = self.patch({'ingredients': [
+            {'id': self.flour.id, 'amount': 250},
+            {'id': self.milk.id, 'amount': 300},
+        ]})
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE'))
+        self.assertEqual(self.rows(), {
+            self.flour.id: (rows[self.flour.id][0], 250),
+            self.milk.id: rows[self.milk.id],
+        })
+        self.assertFalse(self.recipe.similar_outdated)
+
+        writes = self.patch({'ingredients': [
+            {'id': self.flour.id, 'amount': 250},
+            {'id': self.egg.id, 'amount': 2},
+        ]})
+        self.assertEqual(
+            sorted(sql.split()[0] for sql in writes), ['DELETE', 'INSERT']
+        )
+        rows = self.rows()
+        self.assertEqual(set(rows), {self.flour.id, self.egg.id})
+        self.assertEqual(rows[self.egg.id][1], 2)
+        self.assertTrue(self.recipe.similar_outdated)
+        self.assertEqual(postings.rebuild(fix=False), 0)
+        self.assertEqual(cart_totals.rebuild(fix=False), 0)
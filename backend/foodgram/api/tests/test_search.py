@@ -0,0 +1,95 @@
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from recipes import search
+from recipes.models import Recipe, RecipeSearchTerm, Tag
+
+from .base import APITestCase, client_for, create_user
+
+
+class StemTest(SimpleTestCase):
+
+    def test_word_forms_share_a_stem(self):
+        for forms in (
+            ('пирог', 'пироги', 'пирогом', 'Пирога'),
+            ('домашний', 'домашняя', 'домашние', 'домашнего'),
+            ('блины', 'блинов', 'блинами'),
+            ('лёгкий', 'легкая'),
+            ('оладьи', 'оладий'),
+        ):
+            self.assertEqual(len({search.stem(word) for word in forms}), 1)
+
+    def test_short_words_are_kept(self):
+        self.assertEqual(search.terms('Суп, плов и рис'), [
+            'суп', 'плов', 'и', 'рис'
+        ])
+
+
+class RecipeSearchTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.lunch = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+        cls.soup, cls.soup_pie, cls.pie = (
+            Recipe.objects.create(
+                author=cls.author, name=name, text=text,
+                image='static/recipes/dish.png', cooking_time=30,
+            )
+            for name, text in (
+                ('Домашний суп', 'Сварить суп из овощей.'),
+                ('Пирог', 'Подавать с супом или бульоном.'),
+                ('Пирог с яблоками', 'Испечь пироги в духовке.'),
+            )
+        )
+        cls.soup.tags.add(cls.lunch)
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for()
+
+    def found(self, query):
+        response = self.client.get(reverse('api:recipes-list'), query)
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_results_are_ranked(self):
+        self.assertEqual(
+            self.found({'search': 'супы'}), [self.soup.id, self.soup_pie.id]
+        )
+        self.assertEqual(
+            self.found({'search': 'пироги'}), [self.pie.id, self.soup_pie.id]
+        )
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.found({'search': 'пирог яблоко'}), [self.pie.id])
+        self.assertEqual(self.found({'search': 'суп яблоко'}), [])
+        self.assertEqual(self.found({'search': '!!!'}), [])
+
+    def test_search_combines_with_filters_and_pagination(self):
+        self.assertEqual(
+            self.found({'search': 'суп', 'tags': 'lunch'}), [self.soup.id]
+        )
+        response = self.client.get(reverse('api:recipes-list'), {
+            'search': 'суп', 'limit': 1, 'pagination': 'cursor',
+        })
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.soup.id],
+        )
+
+    def test_index_follows_changes(self):
+        self.pie.name = 'Шарлотка'
+        self.pie.save()
+        self.assertEqual(self.found({'search': 'шарлотка'}), [self.pie.id])
+        self.assertEqual(
+            self.found({'search': 'пирог'}), [self.soup_pie.id, self.pie.id]
+        )
+        RecipeSearchTerm.objects.filter(recipe=self.soup).delete()
+        self.assertEqual(search.rebuild(fix=False), 1)
+        self.assertEqual(search.rebuild(), 1)
+        self.assertEqual(search.rebuild(), 0)
+        self.assertEqual(self.found({'search': 'домашние'}), [self.soup.id])
@@ -0,0 +1,351 @@
+import io
+import json
+import os
+from datetime import timedelta
+from unittest import mock
+from uuid import UUID
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from api import shopping_list, shopping_list_jobs
+from recipes.models import Ingredient, ShoppingListJob
+
+from .base import APITestCase, client_for, create_user, recipe_payload
+
+
+@override_settings(RECIPE_THUMBNAILS_MODE='sync')
+class ShoppingListTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.buyer = create_user('buyer')
+        cls.flour, cls.milk = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in (('мука', 'г'), ('молоко', 'мл'))
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for(self.buyer)
+        self.recipe_id = self.request(
+            client_for(self.author), 'post', reverse('api:recipes-list'),
+            recipe_payload({self.flour.id: 200}),
+        ).data['id']
+        self.request(
+            self.client, 'post',
+            reverse(
+                'api:recipes-shopping-cart', kwargs={'pk': self.recipe_id}
+            ),
+        )
+
+    def request(self, client, method, url, data=None, **headers):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(client, method)(
+                url, data, format='json', **headers
+            )
+        self.assertLess(response.status_code, 400, response.data)
+        return response
+
+    def download(self, export_format='pdf', etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        response = self.client.get(
+            reverse('api:recipes-download-shopping-cart'),
+            {'format': export_format}, **headers,
+        )
+        self.assertIn(response.status_code, (200, 304))
+        return response
+
+    def test_not_modified(self):
+        for export_format in ('pdf', 'json'):
+            with self.subTest(export_format=export_format):
+                etag = self.download(export_format)['ETag']
+                response = self.download(export_format, etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(
+                    response['Cache-Control'], 'private, no-cache'
+                )
+        self.assertNotEqual(
+            self.download('pdf')['ETag'], self.download('json')['ETag']
+        )
+
+    def test_recipe_changes_invalidate_the_list(self):
+        etag = self.download()['ETag']
+        self.request(
+            client_for(self.author), 'patch',
+            reverse('api:recipes-detail', kwargs={'pk': self.recipe_id}),
+            recipe_payload({self.flour.id: 300, self.milk.id: 100}),
+        )
+        response = self.download(etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(
+            list(shopping_list.get_rows(self.buyer)),
+            [('молоко', 100, 'мл'), ('мука', 300, 'г')],
+        )
+
+    def test_cart_changes_invalidate_the_list(self):
+        etag = self.download()['ETag']
+        self.request(
+            self.client, 'delete',
+            reverse(
+                'api:recipes-shopping-cart', kwargs={'pk': self.recipe_id}
+            ),
+        )
+        response = self.download(etag=etag)
+        self.assertEqual(response.status_code, 200)
+        # An empty cart still renders.
+        self.assertTrue(b''.join(response.streaming_content).startswith(
+            b'%PDF'
+        ))
+
+    def test_streamed_exports(self):
+        salt = Ingredient.objects.create(
+            name='соль "морская", крупная', measurement_unit='г'
+        )
+        self.request(
+            client_for(self.author), 'patch',
+            reverse('api:recipes-detail', kwargs={'pk': self.recipe_id}),
+            recipe_payload({self.flour.id: 200, salt.id: 5}),
+        )
+        for export_format, content_type, body in (
+            (
+                'csv', 'text/csv; charset=utf-8',
+                'name,amount,measurement_unit\r\n'
+                'мука,200,г\r\n'
+                '"соль ""морская"", крупная",5,г\r\n',
+            ),
+            (
+                'txt', 'text/plain; charset=utf-8',
+                f'{shopping_list.HEADER}\n\n'
+                'мука (г) — 200\n'
+                'соль "морская", крупная (г) — 5\n',
+            ),
+            (
+                'json', 'application/json',
+                '[{"name": "мука", "amount": 200, "measurement_unit": "г"},'
+                '{"name": "соль \\"морская\\", крупная", "amount": 5, '
+                '"measurement_unit": "г"}]',
+            ),
+        ):
+            with self.subTest(export_format=export_format):
+                response = self.download(export_format)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], content_type)
+                self.assertEqual(
+                    response['Content-Disposition'],
+                    f'attachment; filename="shopping_cart.{export_format}"',
+                )
+                self.assertEqual(
+                    response['ETag'],
+                    shopping_list.get_etag(self.buyer, export_format),
+                )
+                self.assertEqual(
+                    response['Cache-Control'], 'private, no-cache'
+                )
+                self.assertEqual(
+                    b''.join(response.streaming_content).decode(), body
+                )
+        self.assertEqual(
+            json.loads(b''.join(self.download('json').streaming_content)),
+            [
+                {'name': 'мука', 'amount': 200, 'measurement_unit': 'г'},
+                {
+                    'name': 'соль "морская", крупная', 'amount': 5,
+                    'measurement_unit': 'г',
+                },
+            ],
+        )
+
+    def test_empty_streamed_exports(self):
+        self.request(
+            self.client, 'delete',
+            reverse(
+                'api:recipes-shopping-cart', kwargs={'pk': self.recipe_id}
+            ),
+        )
+        for export_format, body in (
+            ('csv', 'name,amount,measurement_unit\r\n'),
+            ('txt', f'{shopping_list.HEADER}\n\n'),
+            ('json', '[]'),
+        ):
+            with self.subTest(export_format=export_format):
+                self.assertEqual(
+                    b''.join(
+                        self.download(export_format).streaming_content
+                    ).decode(),
+                    body,
+                )
+
+    def test_versions_are_bumped_after_commit(self):
+        etag = shopping_list.get_etag(self.buyer)
+        with self.captureOnCommitCallbacks() as callbacks:
+            shopping_list.bump_cart_versions([self.buyer.id])
+            # A download before the commit still sees the old cart.
+            self.assertEqual(shopping_list.get_etag(self.buyer), etag)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertNotEqual(shopping_list.get_etag(self.buyer), etag)
+
+
+@override_settings(
+    RECIPE_THUMBNAILS_MODE='sync', SHOPPING_LIST_JOBS_MODE='queue'
+)
+class ShoppingListJobsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = create_user('buyer')
+        cls.flour = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for(self.buyer)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe_id = self.client.post(
+                reverse('api:recipes-list'),
+                recipe_payload({self.flour.id: 200}), format='json',
+            ).data['id']
+            self.client.post(reverse(
+                'api:recipes-shopping-cart', kwargs={'pk': recipe_id}
+            ))
+
+    def enqueue(self, asynchronous='1'):
+        return self.client.get(
+            reverse('api:recipes-download-shopping-cart'),
+            {'format': 'pdf', 'async': asynchronous},
+        )
+
+    def job(self, job_id):
+        return self.client.get(reverse(
+            'api:recipes-download-shopping-cart-job',
+            kwargs={'job_id': job_id},
+        ))
+
+    def assertPDF(self, response):
+        self.assertEqual(response.status_code, 200)
+        try:
+            self.assertTrue(b''.join(response.streaming_content).startswith(
+                b'%PDF'
+            ))
+        finally:
+            response.close()
+
+    def test_async_is_a_boolean(self):
+        for value in ('0', 'false', 'False'):
+            with self.subTest(value=value):
+                self.assertPDF(self.enqueue(value))
+        self.assertEqual(self.enqueue('maybe').status_code, 400)
+        self.assertFalse(ShoppingListJob.objects.exists())
+
+    def test_job_lifecycle(self):
+        response = self.enqueue()
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['id']
+        self.assertTrue(response['Location'].endswith(
+            reverse(
+                'api:recipes-download-shopping-cart-job',
+                kwargs={'job_id': job_id},
+            )
+        ))
+        self.assertEqual(
+            self.job(job_id).data['status'], ShoppingListJob.PENDING
+        )
+        self.assertEqual(shopping_list_jobs.process_pending(), 1)
+        self.assertEqual(shopping_list_jobs.process_pending(), 0)
+        self.assertPDF(self.job(job_id))
+        self.client.force_authenticate(create_user('other'))
+        self.assertEqual(self.job(job_id).status_code, 404)
+
+    def test_failed_job(self):
+        job_id = self.enqueue().data['id']
+        with mock.patch.object(
+            shopping_list, 'get_pdf', side_effect=ValueError('Нет шрифта')
+        ), self.assertLogs('api.shopping_list_jobs', 'ERROR'):
+            shopping_list_jobs.process_pending()
+        response = self.job(job_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data['status'], response.data['error']),
+            (ShoppingListJob.FAILED, 'Нет шрифта'),
+        )
+        self.assertIsNotNone(response.data['finished'])
+
+    def test_stale_jobs_fail(self):
+        queued, running, fresh = (
+            self.enqueue().data['id'] for _ in range(3)
+        )
+        long_ago = timezone.now() - timedelta(minutes=11)
+        ShoppingListJob.objects.update(created=long_ago)
+        ShoppingListJob.objects.filter(id=running).update(
+            status=ShoppingListJob.RUNNING, started=long_ago
+        )
+        ShoppingListJob.objects.filter(id=fresh).update(
+            status=ShoppingListJob.RUNNING, started=timezone.now()
+        )
+        response = self.job(running)
+        self.assertEqual(
+            (response.data['status'], response.data['error']),
+            (ShoppingListJob.FAILED, shopping_list_jobs.STALE_ERROR),
+        )
+        # A queued job waits for the command however old it is.
+        self.assertEqual(
+            self.job(queued).data['status'], ShoppingListJob.PENDING
+        )
+        self.assertEqual(
+            self.job(fresh).data['status'], ShoppingListJob.RUNNING
+        )
+        ShoppingListJob.objects.filter(id=running).update(
+            status=ShoppingListJob.RUNNING
+        )
+        stdout = io.StringIO()
+        call_command('process_shopping_list_jobs', stdout=stdout)
+        self.assertIn(
+            'Обработано задач: 1, просрочено: 1', stdout.getvalue()
+        )
+        self.assertPDF(self.job(queued))
+        # Failed jobs are finished, so they are purged like done ones.
+        self.assertEqual(shopping_list_jobs.purge(timedelta(0)), 2)
+        self.assertEqual(
+            list(ShoppingListJob.objects.values_list('id', flat=True)),
+            [UUID(fresh)],
+        )
+
+    @override_settings(SHOPPING_LIST_JOBS_MODE='thread')
+    def test_lost_thread_jobs_fail(self):
+        job = ShoppingListJob.objects.create(user=self.buyer)
+        ShoppingListJob.objects.update(
+            created=timezone.now() - timedelta(minutes=11)
+        )
+        self.assertEqual(
+            self.job(job.id).data['status'], ShoppingListJob.FAILED
+        )
+
+    def test_late_result_keeps_failure(self):
+        job_id = self.enqueue().data['id']
+        get_pdf = shopping_list.get_pdf
+
+        def render_too_long(*args):
+            ShoppingListJob.objects.filter(id=job_id).update(
+                started=timezone.now() - timedelta(minutes=11)
+            )
+            self.assertEqual(shopping_list_jobs.fail_stale(), 1)
+            return get_pdf(*args)
+
+        with mock.patch.object(shopping_list, 'get_pdf', render_too_long):
+            shopping_list_jobs.process_pending()
+        job = ShoppingListJob.objects.get(id=job_id)
+        self.assertEqual(
+            (job.status, job.error, job.file.name),
+            (ShoppingListJob.FAILED, shopping_list_jobs.STALE_ERROR, ''),
+        )
+        self.assertFalse(os.path.exists(os.path.join(
+            settings.MEDIA_ROOT, 'shopping_lists', f'{job_id}.pdf'
+        )))
@@ -0,0 +1,151 @@
+from unittest import mock
+
+import numpy as np
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from core import similar
+from recipes.models import Ingredient, Recipe, SimilarRecipe, Tag
+
+from .base import APITestCase, client_for, create_user, recipe_payload
+
+
+class FeatureMatrixTest(SimpleTestCase):
+
+    @mock.patch.object(similar, 'COMMON_MIN_RECIPES', 2)
+    def test_common_features_count_in_scores(self):
+        # Feature 0 is in every recipe and goes to the masks.
+        rows = np.array([0, 0, 0, 1, 1, 2, 2])
+        features = np.array([0, 1, 2, 0, 1, 0, 3])
+        matrix = similar.FeatureMatrix(np.array([10, 20, 30]), rows, features)
+        self.assertEqual(matrix.rare.nnz, 4)
+        left, right, scores = similar.top(*matrix.pairs(np.arange(3)), 5)
+        # Recipe 30 shares only the common feature: not a candidate.
+        self.assertEqual(left.tolist(), [0, 1])
+        self.assertEqual(right.tolist(), [1, 0])
+        self.assertEqual(scores.tolist(), [2 / 3, 2 / 3])
+
+    @mock.patch.object(similar, 'COMMON_MIN_RECIPES', 2)
+    def test_recipes_of_common_features_only(self):
+        # Features 0 and 1 are common, recipe 10 has nothing else.
+        rows = np.array([0, 0, 1, 1, 1, 2, 2, 3, 3])
+        features = np.array([0, 1, 0, 1, 2, 0, 3, 1, 4])
+        matrix = similar.FeatureMatrix(
+            np.array([10, 20, 30, 40]), rows, features
+        )
+        self.assertEqual(
+            matrix.common_only.tolist(), [True, False, False, False]
+        )
+        self.assertEqual(len(matrix.pairs(np.arange(4))[0]), 0)
+        left, right, scores = similar.top(*matrix.pairs(np.arange(4), 2), 2)
+        # Recipes 30 and 40 tie, the lower row wins.
+        self.assertEqual(left.tolist(), [0, 0])
+        self.assertEqual(right.tolist(), [1, 2])
+        self.assertEqual(scores.tolist(), [2 / 3, 1 / 3])
+
+
+@override_settings(SIMILAR_RECIPES_COUNT=2)
+class SimilarRecipesTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(8)
+        )
+        cls.tag = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for(self.author)
+
+    def payload(self, ingredients, tags=()):
+        return recipe_payload(
+            {self.ingredients[index].id: 10 for index in ingredients},
+            [tag.id for tag in tags],
+        )
+
+    def create(self, ingredients, tags=()):
+        response = self.client.post(
+            reverse('api:recipes-list'), self.payload(ingredients, tags),
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def similar(self, pk):
+        response = self.client.get(
+            reverse('api:recipes-similar', kwargs={'pk': pk})
+        )
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data]
+
+    def test_top_neighbours_by_jaccard(self):
+        base = self.create([0, 1, 2, 3], [self.tag])
+        close = self.create([0, 1], [self.tag])
+        closer = self.create([0, 1, 2, 3])
+        far = self.create([3, 4, 5])
+        self.create([6, 7])
+        with self.settings(SIMILAR_RECIPES_COUNT=3):
+            self.assertEqual(similar.build(), 5)
+        self.assertEqual(self.similar(base), [closer, close, far])
+        self.assertEqual(self.similar(far), [closer, base])
+        self.assertFalse(Recipe.objects.filter(similar_outdated=True).exists())
+        with self.assertNumQueries(1):
+            self.similar(base)
+
+    def test_incremental_build(self):
+        first = self.create([0, 1])
+        second = self.create([0, 1, 2])
+        unrelated = self.create([5, 6])
+        other = self.create([6, 7])
+        similar.build()
+        self.assertEqual(self.similar(first), [second])
+        response = self.client.patch(
+            reverse('api:recipes-detail', kwargs={'pk': unrelated}),
+            self.payload([0, 1]), format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(Recipe.objects.filter(similar_outdated=True).values_list(
+                'id', flat=True
+            )),
+            [unrelated],
+        )
+        # The edited recipe, the two it joins and the one it left.
+        self.assertEqual(similar.build(), 4)
+        self.assertEqual(self.similar(first), [unrelated, second])
+        self.assertEqual(self.similar(other), [])
+        self.assertEqual(similar.build(), 0)
+        self.assertEqual(similar.build(full=True), 4)
+        self.assertEqual(SimilarRecipe.objects.count(), 6)
+
+    # ``similar`` is a method of the class here.
+    @mock.patch('core.similar.COMMON_MIN_RECIPES', 2)
+    def test_recipes_of_common_features_only(self):
+        plain = self.create([0, 1])
+        richer = self.create([0, 1, 2])
+        salted = self.create([0, 3])
+        other = self.create([1, 4])
+        similar.build()
+        self.assertEqual(self.similar(plain), [richer, salted])
+        response = self.client.patch(
+            reverse('api:recipes-detail', kwargs={'pk': other}),
+            self.payload([0, 1, 5]), format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        # The edited recipe and the common-only one it enters.
+        self.assertEqual(similar.build(), 2)
+        self.assertEqual(self.similar(plain), [richer, other])
+
+    def test_unknown_recipe(self):
+        self.assertEqual(
+            self.client.get(
+                reverse('api:recipes-similar', kwargs={'pk': 404})
+            ).status_code,
+            404,
+        )
@@ -0,0 +1,116 @@
+import io
+import os
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+
+from core.media_gc import collect_garbage, referenced_names
+from recipes import thumbnails
+from recipes.models import Ingredient, Recipe
+
+from .base import APITestCase, client_for, create_user, recipe_payload
+from .test_thumbnails import png_data_url
+
+
+@override_settings(RECIPE_THUMBNAILS_MODE='sync')
+class ContentAddressedStorageTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for(self.author)
+        self.storage = thumbnails.get_storage()
+
+    def payload(self, image):
+        return recipe_payload({self.ingredient.id: 100}, image=image)
+
+    def create_recipe(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('api:recipes-list'), self.payload(image),
+                format='json',
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        return Recipe.objects.get(id=response.data['id'])
+
+    def test_same_bytes_share_one_sharded_file(self):
+        name = self.storage.save('static/recipes/a.PNG', ContentFile(b'x'))
+        digest = os.path.basename(name).split('.')[0]
+        self.assertEqual(
+            name, f'static/recipes/{digest[:2]}/{digest[2:4]}/{digest}.png'
+        )
+        path = self.storage.path(name)
+        os.utime(path, (0, 0))
+        self.assertEqual(
+            self.storage.save('static/recipes/b.png', ContentFile(b'x')), name
+        )
+        # A re-upload makes the file young again for the collector.
+        self.assertGreater(os.path.getmtime(path), 0)
+        self.assertNotEqual(
+            self.storage.save('static/recipes/c.png', ContentFile(b'y')), name
+        )
+
+    def test_resaving_a_recipe_keeps_its_image(self):
+        image = png_data_url(40, 20)
+        first = self.create_recipe(image)
+        second = self.create_recipe(image)
+        self.assertEqual(first.image.name, second.image.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse('api:recipes-detail', kwargs={'pk': first.id}),
+                self.payload(image), format='json',
+            )
+        first.refresh_from_db()
+        self.assertEqual(first.image.name, second.image.name)
+
+    def test_garbage_collection_keeps_referenced_files(self):
+        kept = self.create_recipe(png_data_url(40, 20))
+        dropped = self.create_recipe(png_data_url(60, 20))
+        orphans = {dropped.image.name} | thumbnails.stored_names(
+            dropped.thumbnails
+        )
+        dropped.delete()
+
+        self.assertEqual(collect_garbage(timedelta(hours=1))[0], 0)
+        self.assertEqual(
+            collect_garbage(timedelta(0), dry_run=True)[0], len(orphans)
+        )
+        self.assertTrue(all(self.storage.exists(name) for name in orphans))
+
+        call_command(
+            'collect_media_garbage', '--min-age-hours=0', stdout=io.StringIO()
+        )
+        self.assertFalse(any(self.storage.exists(name) for name in orphans))
+        for name in {kept.image.name} | thumbnails.stored_names(
+            kept.thumbnails
+        ):
+            self.assertTrue(self.storage.exists(name), name)
+
+    def test_garbage_collection_keeps_files_uploaded_meanwhile(self):
+        name = self.storage.save('static/recipes/a.png', ContentFile(b'z'))
+        os.utime(self.storage.path(name), (0, 0))
+
+        def reupload_after_snapshot():
+            # The references are read before the upload commits.
+            names = referenced_names()
+            self.storage.save('static/recipes/b.png', ContentFile(b'z'))
+            return names
+
+        with mock.patch(
+            'core.media_gc.referenced_names', reupload_after_snapshot
+        ):
+            self.assertEqual(collect_garbage(timedelta(minutes=1))[0], 0)
+        self.assertTrue(self.storage.exists(name))
+        os.utime(self.storage.path(name), (0, 0))
+        self.assertEqual(collect_garbage(timedelta(minutes=1))[0], 1)
+        self.assertFalse(self.storage.exists(name))
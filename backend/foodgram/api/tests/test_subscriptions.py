@@ -0,0 +1,74 @@
+import unittest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from recipes.models import Recipe
+from users.models import Follow
+
+from .base import APITestCase, client_for, create_user
+
+
+class RecipePreviewsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.prolific, cls.quiet = (
+            create_user(username) for username in ('prolific', 'quiet')
+        )
+        cls.recipes = {
+            author.id: [
+                Recipe.objects.create(
+                    author=author, name=f'Рецепт {index}', text='Описание',
+                    image='static/recipes/dish.png', cooking_time=10,
+                ).id
+                for index in range(count)
+            ]
+            for author, count in ((cls.prolific, 30), (cls.quiet, 2))
+        }
+        Follow.objects.bulk_create(
+            Follow(user=cls.reader, author=author)
+            for author in (cls.prolific, cls.quiet)
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for(self.reader)
+
+    def subscriptions(self, **query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('api:users-subscriptions'), query
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'], queries
+
+    def test_latest_recipes_per_author(self):
+        results, _ = self.subscriptions(recipes_limit=3)
+        self.assertEqual(
+            {
+                author['id']: [recipe['id'] for recipe in author['recipes']]
+                for author in results
+            },
+            {
+                author_id: recipe_ids[:-4:-1]
+                for author_id, recipe_ids in self.recipes.items()
+            },
+        )
+        results, _ = self.subscriptions()
+        self.assertEqual(
+            [len(author['recipes']) for author in results], [30, 2]
+        )
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite query plan')
+    def test_previews_use_the_author_index(self):
+        _, queries = self.subscriptions(recipes_limit=3)
+        sql = queries.captured_queries[-1]['sql']
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        # One subquery per author, not one per fetched recipe.
+        self.assertNotIn('CORRELATED', plan)
+        self.assertIn('recipe_author_latest_idx', plan)
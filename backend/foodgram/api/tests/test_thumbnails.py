@@ -0,0 +1,98 @@
+import base64
+import io
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+
+from recipes import thumbnails
+from recipes.models import Ingredient, Recipe
+
+from .base import APITestCase, client_for, create_user, recipe_payload
+
+
+def png_data_url(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), (200, 80, 40, 128)).save(
+        buffer, 'PNG'
+    )
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+@override_settings(
+    RECIPE_THUMBNAILS_MODE='sync',
+    RECIPE_THUMBNAIL_WIDTHS=(150, 300, 600),
+)
+class ThumbnailsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for(self.author)
+
+    def create_recipe(self, width, height):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('api:recipes-list'),
+                recipe_payload(
+                    {self.ingredient.id: 100},
+                    image=png_data_url(width, height),
+                ),
+                format='json',
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        return Recipe.objects.get(id=response.data['id'])
+
+    def assertThumbnail(self, name, extension, width):
+        storage = thumbnails.get_storage()
+        self.assertTrue(storage.exists(name), name)
+        with storage.open(name, 'rb') as file:
+            image = Image.open(file)
+            self.assertEqual(image.format.lower(), extension)
+            self.assertEqual(image.width, width)
+
+    def test_upload_creates_thumbnails_and_srcset(self):
+        recipe = self.create_recipe(400, 200)
+        self.assertEqual(recipe.thumbnails['source'], recipe.image.name)
+        for extension in thumbnails.FORMATS:
+            self.assertEqual(
+                set(recipe.thumbnails[extension]), {'150', '300'}
+            )
+            for width, name in recipe.thumbnails[extension].items():
+                self.assertThumbnail(name, extension, int(width))
+
+        response = self.client.get(
+            reverse('api:recipes-detail', kwargs={'pk': recipe.id})
+        )
+        srcset = response.data['image_srcset']
+        self.assertEqual(set(srcset), set(thumbnails.FORMATS))
+        self.assertRegex(
+            srcset['webp'], r'^http://testserver/media/\S+\.webp 150w, '
+            r'http://testserver/media/\S+\.webp 300w$'
+        )
+
+    def test_small_image_keeps_its_width(self):
+        recipe = self.create_recipe(100, 50)
+        self.assertEqual(recipe.thumbnails['jpeg'].keys(), {'100'})
+
+    def test_backfill_command(self):
+        recipe = self.create_recipe(400, 200)
+        Recipe.objects.filter(id=recipe.id).update(thumbnails={})
+        call_command('generate_thumbnails', stdout=io.StringIO())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.thumbnails['source'], recipe.image.name)
+        names = thumbnails.stored_names(recipe.thumbnails)
+
+        call_command('generate_thumbnails', '--force', stdout=io.StringIO())
+        recipe.refresh_from_db()
+        storage = thumbnails.get_storage()
+        self.assertEqual(thumbnails.stored_names(recipe.thumbnails), names)
+        self.assertTrue(all(storage.exists(name) for name in names))
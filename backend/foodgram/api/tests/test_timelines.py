@@ -0,0 +1,111 @@
+from django.test import override_settings
+from django.urls import reverse
+
+from core import timelines
+from recipes.models import Recipe, TimelineEntry
+from users.models import User
+
+from .base import APITestCase, client_for, create_user
+
+
+@override_settings(FEED_FANOUT_LIMIT=1, FEED_BACKFILL_SIZE=2)
+class FeedTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.other, cls.author, cls.star = (
+            create_user(username)
+            for username in ('reader', 'other', 'author', 'star')
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for(self.reader)
+
+    def publish(self, author, name):
+        recipe = Recipe.objects.create(
+            author=author, name=name, text='Описание',
+            image='static/recipes/dish.png', cooking_time=10,
+        )
+        User.objects.filter(id=author.id).update(
+            recipes_count=author.recipes.count()
+        )
+        timelines.recipe_created(recipe)
+        return recipe.id
+
+    def subscribe(self, client, author, method='post'):
+        response = getattr(client, method)(
+            reverse('api:users-subscribe', kwargs={'pk': author.id})
+        )
+        self.assertLess(response.status_code, 400)
+
+    def feed(self, **query):
+        response = self.client.get(reverse('api:recipes-feed'), query)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def feed_ids(self):
+        return [recipe['id'] for recipe in self.feed().data['results']]
+
+    def test_fan_out_backfill_and_prune(self):
+        first, second, third = (
+            self.publish(self.author, name) for name in ('1', '2', '3')
+        )
+        self.subscribe(self.client, self.author)
+        self.assertEqual(self.feed_ids(), [third, second])
+        fourth = self.publish(self.author, '4')
+        self.assertEqual(self.feed_ids(), [fourth, third, second])
+        self.subscribe(self.client, self.author, 'delete')
+        self.assertEqual(self.feed_ids(), [])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_popular_authors_are_merged_on_read(self):
+        self.subscribe(self.client, self.star)
+        self.subscribe(client_for(self.other), self.star)
+        self.subscribe(self.client, self.author)
+        star_recipe = self.publish(self.star, 'звезда')
+        author_recipe = self.publish(self.author, 'автор')
+        self.assertFalse(
+            TimelineEntry.objects.filter(recipe_id=star_recipe).exists()
+        )
+        self.assertEqual(self.feed_ids(), [author_recipe, star_recipe])
+
+    def test_authors_below_the_limit_are_fanned_out(self):
+        other = client_for(self.other)
+        self.subscribe(self.client, self.star)
+        self.subscribe(other, self.star)
+        published = [self.publish(self.star, name) for name in '123']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subscribe(other, self.star, 'delete')
+        self.assertFalse(timelines.is_popular(
+            User.objects.get(id=self.star.id)
+        ))
+        self.assertEqual(self.feed_ids(), published[:0:-1])
+
+    def test_cursor_pagination(self):
+        self.subscribe(self.client, self.author)
+        recipes = [self.publish(self.author, str(index)) for index in range(3)]
+        page = self.feed(limit=2).data
+        self.assertNotIn('count', page)
+        self.assertEqual(
+            [recipe['id'] for recipe in page['results']], recipes[:0:-1]
+        )
+        self.assertEqual(
+            [
+                recipe['id']
+                for recipe in self.client.get(page['next']).data['results']
+            ],
+            recipes[:1],
+        )
+
+    def test_rebuild(self):
+        self.publish(self.author, '1')
+        self.subscribe(self.client, self.author)
+        TimelineEntry.objects.all().delete()
+        TimelineEntry.objects.create(
+            user=self.reader, recipe_id=self.publish(self.star, 'звезда')
+        )
+        self.assertEqual(timelines.rebuild(fix=False), 2)
+        self.assertEqual(timelines.rebuild(), 2)
+        self.assertEqual(timelines.rebuild(), 0)
+        self.assertEqual(len(self.feed_ids()), 1)
@@ -0,0 +1,103 @@
+import datetime
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import trending
+from recipes.models import (Favorite, Recipe, ShoppingCart, Tag,
+                            TrendingRecipe)
+
+from .base import APITestCase, client_for, create_user
+
+
+@override_settings(TRENDING_WINDOW_DAYS=7, TRENDING_HALF_LIFE_HOURS=24)
+class TrendingTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.other, *cls.readers = (
+            create_user(username)
+            for username in ('author', 'other', 'first', 'second', 'third')
+        )
+        cls.tag = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+        cls.old, cls.fresh, cls.carted, cls.tagged, cls.quiet = (
+            Recipe.objects.create(
+                author=author, name=name, text='Описание',
+                image='static/recipes/dish.png', cooking_time=10,
+            )
+            for author, name in (
+                (cls.author, 'старый'), (cls.author, 'свежий'),
+                (cls.other, 'в корзине'), (cls.author, 'с тегом'),
+                (cls.author, 'без событий'),
+            )
+        )
+        cls.tagged.tags.add(cls.tag)
+        cls.now = timezone.now()
+        cls.add(Favorite, cls.old, days=3, count=3)
+        cls.add(Favorite, cls.fresh, days=0, count=2)
+        cls.add(ShoppingCart, cls.carted, days=1, count=1)
+        cls.add(Favorite, cls.tagged, days=2, count=1)
+        # Older than the window: does not count at all.
+        cls.add(ShoppingCart, cls.quiet, days=10, count=3)
+
+    @classmethod
+    def add(cls, model, recipe, days, count):
+        for reader in cls.readers[:count]:
+            event = model.objects.create(user=reader, recipe=recipe)
+            model.objects.filter(pk=event.pk).update(
+                created=cls.now - datetime.timedelta(days=days)
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_for()
+
+    def trending_ids(self, **query):
+        response = self.client.get(
+            reverse('api:recipes-list'), {'ordering': 'trending', **query}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_scores_decay_with_age(self):
+        scores = trending.scores(self.now)
+        self.assertAlmostEqual(scores[self.fresh.id], 2.0, places=1)
+        self.assertAlmostEqual(scores[self.carted.id], 1.0, places=1)
+        self.assertAlmostEqual(scores[self.old.id], 3 / 8, places=1)
+        self.assertNotIn(self.quiet.id, scores)
+
+    def test_ordering(self):
+        self.assertEqual(trending.refresh(self.now), 4)
+        self.assertEqual(self.trending_ids(), [
+            self.fresh.id, self.carted.id, self.old.id, self.tagged.id,
+            self.quiet.id,
+        ])
+
+    def test_filters(self):
+        trending.refresh(self.now)
+        self.assertEqual(
+            self.trending_ids(author=self.author.id),
+            [self.fresh.id, self.old.id, self.tagged.id, self.quiet.id],
+        )
+        self.assertEqual(self.trending_ids(tags='lunch'), [self.tagged.id])
+
+    def test_refresh_replaces_scores(self):
+        trending.refresh(self.now)
+        Favorite.objects.filter(recipe=self.fresh).delete()
+        self.assertEqual(trending.refresh(self.now), 3)
+        self.assertFalse(
+            TrendingRecipe.objects.filter(recipe=self.fresh).exists()
+        )
+        # Unscored recipes go last, newest first.
+        self.assertEqual(
+            self.trending_ids()[-2:], [self.quiet.id, self.fresh.id]
+        )
+
+    def test_unknown_ordering(self):
+        response = self.client.get(
+            reverse('api:recipes-list'), {'ordering': 'random'}
+        )
+        self.assertEqual(response.status_code, 400)
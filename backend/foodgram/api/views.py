@@ -1,42 +1,56 @@
 import io
-import os
-
-from django.conf import settings
 
 from api.filters import IngredientFilter, RecipeFilter
 from api.permissions import IsOwnerAdminOrReadOnly
-from django.db.models import Sum
-from django.http import FileResponse
+from core import cart_totals, membership_sets, memberships, timelines
+from core.counters import change_counter
+from django.db import transaction
+from django.db.models import Prefetch, Q, prefetch_related_objects
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.http import parse_etags
 from django_filters.rest_framework import DjangoFilterBackend
+from recipes import ingredient_index, postings
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
-from reportlab.lib.units import inch
-from reportlab.lib import pagesizes
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
-from reportlab.rl_config import defaultPageSize
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from rest_framework import permissions, status
+                            ShoppingCart, ShoppingListJob, SimilarRecipe, Tag)
+from recipes.signals import TAGS_VERSION
+from rest_framework import fields, permissions, status
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from users.models import Follow, User
 
-from . import serializers, paginators
+from . import (paginators, recipe_rows, renderers, serializers,
+               shopping_list, shopping_list_jobs)
+from .mixins import VersionedListCacheMixin
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(VersionedListCacheMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    cache_version_name = ingredient_index.VERSION_NAME
+    cache_query_params = ('name',)
+
+    def get_cache_params(self, request):
+        # The index search ignores the case.
+        return {'name': request.query_params.get('name', '').casefold()}
 
+    def get_list_data(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name:
+            return ingredient_index.search(name)
+        return super().get_list_data(request, *args, **kwargs)
 
-class TagViewSet(ReadOnlyModelViewSet):
+
+class TagViewSet(VersionedListCacheMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
     pagination_class = None
+    cache_version_name = TAGS_VERSION
 
 
 class RecipeViewSet(ModelViewSet):
@@ -45,149 +59,272 @@ class RecipeViewSet(ModelViewSet):
     permission_classes = (IsOwnerAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = paginators.LimitPaginator
+    pagination_class = paginators.RecipePaginator
+
+    def get_queryset(self):
+        return Recipe.objects.select_related('author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'recipes',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ).order_by('id'),
+            ),
+        )
 
     def get_serializer_class(self):
         if self.request.method in permissions.SAFE_METHODS:
             return serializers.GetRecipeSerializer
         return serializers.RecipeSerializer
 
+    def list(self, request, *args, **kwargs):
+        # Responses are built by recipe_rows, not GetRecipeSerializer.
+        recipes = self.paginate_queryset(recipe_rows.rows(
+            self.filter_queryset(self.get_queryset())
+        ))
+        return self.get_paginated_response(
+            recipe_rows.serialize(recipes, request)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe = get_object_or_404(
+            recipe_rows.rows(self.filter_queryset(self.get_queryset())),
+            pk=kwargs[self.lookup_url_kwarg or self.lookup_field],
+        )
+        return Response(recipe_rows.serialize([recipe], request)[0])
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        recipe = serializer.save()
+        change_counter(
+            User.objects.filter(id=recipe.author_id), 'recipes_count', 1
+        )
+        timelines.recipe_created(recipe)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        shopping_list.bump_cart_versions(
+            serializer.instance.carts.values_list('user_id', flat=True)
+        )
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        author_id = instance.author_id
+        shopping_list.bump_cart_versions(
+            instance.carts.values_list('user_id', flat=True)
+        )
+        cart_totals.recipe_deleted(instance.id)
+        postings.recipe_deleted(instance.id)
+        instance.delete()
+        change_counter(
+            User.objects.filter(id=author_id), 'recipes_count', -1
+        )
+
     @action(
-        methods=['post', 'delete'],
-        detail=True,
+        detail=False,
         permission_classes=(permissions.IsAuthenticated,)
     )
-    def favorite(self, request, pk):
+    def feed(self, request):
+        paginator = paginators.FeedPaginator()
+        recipes = paginator.paginate_queryset(
+            recipe_rows.rows(
+                timelines.feed(request.user.id, self.get_queryset())
+            ),
+            request, view=self,
+        )
+        return paginator.get_paginated_response(
+            recipe_rows.serialize(recipes, request)
+        )
+
+    @action(detail=True)
+    def similar(self, request, pk):
+        neighbours = SimilarRecipe.objects.filter(
+            recipe_id=pk
+        ).select_related('similar').order_by('-score', 'similar_id')
+        recipes = [neighbour.similar for neighbour in neighbours]
+        if not recipes:
+            get_object_or_404(Recipe, id=pk)
+        serializer = serializers.RecipePreviewSerializer(
+            recipes, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
+
+    def update_membership(self, request, model, recipe_ids):
+        change = (
+            memberships.add if request.method == 'POST'
+            else memberships.remove
+        )
+        if change(model, request.user.id, recipe_ids) and (
+            model is ShoppingCart
+        ):
+            shopping_list.bump_cart_versions([request.user.id])
+
+    def membership(self, request, model, pk, removed_message):
         recipe = get_object_or_404(Recipe, id=pk)
+        self.update_membership(request, model, [recipe.id])
         if request.method == 'POST':
-            if Favorite.objects.filter(
-                    recipe=recipe, user=self.request.user
-            ).exists():
-                return Response(
-                    'Рецепт уже в избранном!',
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            Favorite.objects.create(recipe=recipe, user=self.request.user)
             serializer = serializers.RecipePreviewSerializer(
                 recipe, context={'request': request}
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        favorited = Favorite.objects.filter(
-            recipe=recipe, user_id=self.request.user
+        return Response(removed_message, status=status.HTTP_204_NO_CONTENT)
+
+    def bulk_membership(self, request, model):
+        serializer = serializers.RecipeIdsSerializer(
+            data=request.data, context={'request': request}
         )
-        if favorited.exists():
-            favorited.delete()
-            return Response(
-                'Рецепт удален из любимых!', status=status.HTTP_204_NO_CONTENT
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.validated_data['recipes']
+        self.update_membership(
+            request, model, [recipe.id for recipe in recipes]
+        )
+        if request.method == 'POST':
+            serializer = serializers.RecipePreviewSerializer(
+                recipes, many=True, context={'request': request}
             )
-        return Response(
-            'Ошибка запроса!', status=status.HTTP_400_BAD_REQUEST
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        methods=['post', 'delete'],
+        detail=True,
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def favorite(self, request, pk):
+        return self.membership(
+            request, Favorite, pk, 'Рецепт удален из любимых!'
         )
 
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='favorite',
+        url_name='favorite-bulk',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def favorite_bulk(self, request):
+        return self.bulk_membership(request, Favorite)
+
     @action(
         methods=['post', 'delete'],
         detail=True,
         permission_classes=(permissions.IsAuthenticated,)
     )
     def shopping_cart(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        if request.method == 'POST':
-            if ShoppingCart.objects.filter(
-                    recipe=recipe, user=self.request.user
-            ).exists():
-                return Response(
-                    'Рецепт уже в cписке покупок!',
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            ShoppingCart.objects.create(recipe=recipe, user=self.request.user)
-            serializer = serializers.RecipePreviewSerializer(
-                recipe, context={'request': request}
-            )
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        in_shopping_cart = ShoppingCart.objects.filter(
-            recipe=recipe, user_id=self.request.user
-        )
-        if in_shopping_cart.exists():
-            in_shopping_cart.delete()
-            return Response(
-                'Рецепт удален из списка!', status=status.HTTP_204_NO_CONTENT
-            )
-        return Response(
-            'Ошибка запроса!', status=status.HTTP_400_BAD_REQUEST
+        return self.membership(
+            request, ShoppingCart, pk, 'Рецепт удален из списка!'
         )
 
     @action(
+        methods=['post', 'delete'],
         detail=False,
+        url_path='shopping_cart',
+        url_name='shopping-cart-bulk',
         permission_classes=(permissions.IsAuthenticated,)
+    )
+    def shopping_cart_bulk(self, request):
+        return self.bulk_membership(request, ShoppingCart)
+
+    @action(
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=(
+            JSONRenderer, renderers.PDFRenderer, renderers.CSVRenderer,
+            renderers.PlainTextRenderer,
+        ),
         )
     def download_shopping_cart(self, request):
-        def firstPageContent(page_canvas, document):
-            header_content = 'Список покупок'
-            headerHeight = defaultPageSize[1] - 50
-            headerWidth = defaultPageSize[0]/2.0
-
-            page_canvas.saveState()
-            page_canvas.setFont('Verdana', 18)
-            page_canvas.drawCentredString(
-                headerWidth,
-                headerHeight,
-                header_content
+        export_format = request.query_params.get('format', 'pdf')
+        etag = shopping_list.get_etag(request.user, export_format)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers=headers
             )
-            page_canvas.restoreState()
-
-        pdfmetrics.registerFont(
-            TTFont('Verdana', os.path.join(settings.FONTS_ROOT, 'Verdana.ttf'))
+        asynchronous = fields.BooleanField().to_internal_value(
+            request.query_params.get('async', False)
         )
+        if export_format == 'pdf' and asynchronous:
+            job = shopping_list_jobs.enqueue(request.user)
+            return Response(
+                serializers.ShoppingListJobSerializer(job).data,
+                status=status.HTTP_202_ACCEPTED,
+                # Not DRF's reverse: it would carry ?format=pdf over to
+                # the job view, which does not render PDF.
+                headers={'Location': request.build_absolute_uri(reverse(
+                    'api:recipes-download-shopping-cart-job',
+                    kwargs={'job_id': job.id},
+                ))},
+            )
+        if export_format in shopping_list.STREAMED_FORMATS:
+            stream, content_type, extension = (
+                shopping_list.STREAMED_FORMATS[export_format]
+            )
+            response = StreamingHttpResponse(
+                stream(shopping_list.iter_rows(request.user)),
+                content_type=content_type,
+            )
+            response['Content-Disposition'] = (
+                f'attachment; filename="shopping_cart.{extension}"'
+            )
+        else:
+            response = FileResponse(
+                io.BytesIO(shopping_list.get_pdf(request.user, etag)),
+                as_attachment=True, filename='shopping_cart.pdf',
+            )
+        for header, value in headers.items():
+            response[header] = value
+        return response
 
-        shopping_cart = RecipeIngredient.objects.filter(
-            recipe__carts__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(
-            ingredient_amount=Sum('amount')
-        ).values_list(
-            'ingredient__name',
-            'ingredient_amount',
-            'ingredient__measurement_unit'
-        )
-
-        document_content = [
-            (ingredient[0], ingredient[1], ingredient[2])
-            for ingredient in shopping_cart
-        ]
-
-        buffer = io.BytesIO()
-        document = SimpleDocTemplate(
-            buffer,
-            pagesize=pagesizes.portrait(pagesizes.A4),
+    @action(
+        detail=False,
+        url_path=r'download_shopping_cart/jobs/(?P<job_id>[0-9a-f-]+)',
+        url_name='download-shopping-cart-job',
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def download_shopping_cart_job(self, request, job_id):
+        job = get_object_or_404(
+            ShoppingListJob, id=job_id, user=request.user
         )
+        shopping_list_jobs.fail_if_stale(job)
+        if job.status == ShoppingListJob.DONE:
+            return FileResponse(
+                job.file.open('rb'),
+                as_attachment=True, filename='shopping_cart.pdf',
+            )
+        return Response(serializers.ShoppingListJobSerializer(job).data)
 
-        columns_width = [6*inch, 1*inch, 1*inch]
-        table = Table(
-            document_content,
-            rowHeights=20,
-            repeatRows=1,
-            colWidths=columns_width,
-            hAlign='CENTER'
-        )
 
-        table.setStyle(TableStyle([
-            ('FONTSIZE', (0, 0), (-1, -1), 18),
-            ('FONTNAME', (0, 0), (-1, -1), "Verdana"),
-        ]))
+class UserViewSet(ModelViewSet):
+    queryset = User.objects.order_by('id')
+    serializer_class = serializers.UserSerializer
+    pagination_class = paginators.UserPaginator
 
-        document.build([table], onFirstPage=firstPageContent)
+    def add_recipe_previews(self, authors):
+        """Attach ``preview_recipes`` to the authors in one query.
 
-        buffer.seek(0)
-        return FileResponse(
-            buffer, as_attachment=True, filename='shopping_cart.pdf',
+        With ``recipes_limit`` every author gets their own subquery for
+        the latest recipes, served by ``recipe_author_latest_idx``. The
+        subqueries are not correlated with the fetched rows, so the cost
+        does not grow with the number of recipes of an author.
+        """
+        recipes = Recipe.objects.all()
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if authors and recipes_limit and recipes_limit.isdigit():
+            latest = Q()
+            for author in authors:
+                latest |= Q(pk__in=Recipe.objects.filter(
+                    author_id=author.id
+                ).order_by('-pub_date', '-id').values('pk')[
+                    :int(recipes_limit)
+                ])
+            recipes = recipes.filter(latest)
+        prefetch_related_objects(
+            authors,
+            Prefetch('recipes', queryset=recipes, to_attr='preview_recipes'),
         )
-
-
-class UserViewSet(ModelViewSet):
-    queryset = User.objects.all()
-    serializer_class = serializers.UserSerializer
-    pagination_class = paginators.LimitPaginator
+        return authors
 
     @action(
         detail=False,
@@ -208,7 +345,7 @@ class UserViewSet(ModelViewSet):
         serializer = serializers.PasswordSerializer(data=request.data)
         if serializer.is_valid():
             user.set_password(serializer.validated_data['new_password'])
-            user.save()
+            user.save(update_fields=['password'])
             return Response(
                 'Пароль установлен!', status=status.HTTP_204_NO_CONTENT
             )
@@ -236,16 +373,34 @@ class UserViewSet(ModelViewSet):
                     'Вы уже подписаны!',
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            Follow.objects.create(author=author, user=self.request.user)
+            with transaction.atomic():
+                Follow.objects.create(author=author, user=self.request.user)
+                timelines.subscribed(request.user.id, author)
+                membership_sets.invalidate(
+                    membership_sets.FOLLOWS, [request.user.id]
+                )
+                change_counter(
+                    User.objects.filter(id=author.id), 'followers_count', 1
+                )
             serializer = serializers.FollowSerializer(
-                author, context={'request': request}
+                self.add_recipe_previews([author])[0],
+                context={'request': request}
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         subscription = Follow.objects.filter(
             author=author, user_id=self.request.user
         )
         if subscription.exists():
-            subscription.delete()
+            with transaction.atomic():
+                deleted, _ = subscription.delete()
+                timelines.unsubscribed(request.user.id, author)
+                membership_sets.invalidate(
+                    membership_sets.FOLLOWS, [request.user.id]
+                )
+                change_counter(
+                    User.objects.filter(id=author.id),
+                    'followers_count', -deleted
+                )
             return Response(
                 'Подписка отменена!', status=status.HTTP_204_NO_CONTENT
             )
@@ -259,9 +414,11 @@ class UserViewSet(ModelViewSet):
     )
     def subscriptions(self, request):
         user = self.request.user
-        queryset = User.objects.filter(following__user=user).all()
-        results = self.paginate_queryset(queryset)
+        results = self.paginate_queryset(
+            User.objects.filter(following__user=user).order_by('id')
+        )
         serializer = serializers.FollowSerializer(
-            results, context={"request": request}, many=True
+            self.add_recipe_previews(list(results)),
+            context={"request": request}, many=True,
         )
         return self.get_paginated_response(serializer.data)
@@ -0,0 +1,170 @@
+"""Per-user shopping cart totals.
+
+``CartIngredient`` keeps the summed amount of every ingredient in a
+user's cart, so a shopping list is read from one user's rows instead of
+aggregating ``RecipeIngredient`` over all recipes in the cart. Every
+change of a cart or of a carted recipe's ingredients is applied here as
+a delta; ``rebuild`` compares the table with the join and repairs it.
+"""
+import collections
+
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import CartIngredient, RecipeIngredient, ShoppingCart
+from users.models import User
+
+USERS_BATCH_SIZE = 500
+
+
+def chunks(ids, size):
+    ids = sorted(set(ids))
+    return (ids[start:start + size] for start in range(0, len(ids), size))
+
+
+def recipe_amounts(recipe_ids):
+    """Summed amount of every ingredient of the recipes by ingredient id."""
+    amounts = collections.Counter()
+    for ingredient_id, amount in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('ingredient_id', 'amount'):
+        amounts[ingredient_id] += amount
+    return amounts
+
+
+def apply_deltas(user_ids, deltas):
+    """Add ``deltas`` (ingredient id -> amount) to the users' totals.
+
+    Rows of the users are locked in primary key order, so concurrent
+    changes of the same cart are serialized and cannot deadlock.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    for users in chunks(user_ids, USERS_BATCH_SIZE):
+        with transaction.atomic():
+            list(
+                User.objects.select_for_update().filter(pk__in=users)
+                .order_by('pk').values_list('pk', flat=True)
+            )
+            existing = {
+                (row.user_id, row.ingredient_id): row
+                for row in CartIngredient.objects.filter(
+                    user_id__in=users, ingredient_id__in=deltas
+                )
+            }
+            changed, emptied, created = [], [], []
+            for user_id in users:
+                for ingredient_id, delta in deltas.items():
+                    row = existing.get((user_id, ingredient_id))
+                    if row is None:
+                        if delta > 0:
+                            created.append(CartIngredient(
+                                user_id=user_id, ingredient_id=ingredient_id,
+                                total_amount=delta,
+                            ))
+                        continue
+                    row.total_amount += delta
+                    if row.total_amount > 0:
+                        changed.append(row)
+                    else:
+                        emptied.append(row.pk)
+            if changed:
+                CartIngredient.objects.bulk_update(changed, ['total_amount'])
+            if emptied:
+                CartIngredient.objects.filter(pk__in=emptied).delete()
+            if created:
+                CartIngredient.objects.bulk_create(created)
+
+
+def add_recipes(user_id, recipe_ids):
+    if recipe_ids:
+        apply_deltas([user_id], recipe_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    if recipe_ids:
+        amounts = recipe_amounts(recipe_ids)
+        apply_deltas(
+            [user_id], {pk: -amount for pk, amount in amounts.items()}
+        )
+
+
+def holders(recipe_id):
+    return ShoppingCart.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('user_id', flat=True)
+
+
+def recipe_changed(recipe_id, old_amounts, new_amounts):
+    """Propagate an ingredient edit to every cart holding the recipe."""
+    deltas = collections.Counter(new_amounts)
+    deltas.subtract(old_amounts)
+    apply_deltas(holders(recipe_id), deltas)
+
+
+def recipe_deleted(recipe_id):
+    """Subtract the recipe from every cart; call before deleting it."""
+    amounts = recipe_amounts([recipe_id])
+    apply_deltas(
+        holders(recipe_id), {pk: -amount for pk, amount in amounts.items()}
+    )
+
+
+def expected_totals(user_ids):
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in RecipeIngredient.objects.filter(
+            recipe__carts__user__in=user_ids
+        ).values_list('recipe__carts__user', 'ingredient').annotate(
+            total=Sum('amount')
+        ).order_by().iterator()
+    }
+
+
+def stored_totals(user_ids):
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in CartIngredient.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id', 'ingredient_id', 'total_amount').iterator()
+    }
+
+
+def rebuild(fix=True, batch_size=USERS_BATCH_SIZE):
+    """Compare the totals with the cart join, fix drifted users if asked.
+
+    Returns the number of drifted (user, ingredient) rows.
+    """
+    user_ids = set(
+        ShoppingCart.objects.values_list('user_id', flat=True).distinct()
+    )
+    user_ids.update(
+        CartIngredient.objects.values_list('user_id', flat=True).distinct()
+    )
+    drift = 0
+    for users in chunks(user_ids, batch_size):
+        expected = expected_totals(users)
+        stored = stored_totals(users)
+        drifted = {
+            key for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        }
+        drift += len(drifted)
+        if not fix or not drifted:
+            continue
+        drifted_users = {user_id for user_id, _ in drifted}
+        with transaction.atomic():
+            CartIngredient.objects.filter(user_id__in=drifted_users).delete()
+            CartIngredient.objects.bulk_create(
+                (
+                    CartIngredient(
+                        user_id=user_id, ingredient_id=ingredient_id,
+                        total_amount=total,
+                    )
+                    for (user_id, ingredient_id), total in expected.items()
+                    if user_id in drifted_users
+                ),
+                batch_size=5000,
+            )
+    return drift
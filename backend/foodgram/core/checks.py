@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Versions bumped in one process must be seen by all of them.
+
+    Membership sets, shopping lists, list responses and their ETags are
+    invalidated through ``core.versions``. With a cache local to the
+    process a bump made by another gunicorn worker or by a management
+    command never reaches the web worker, which serves stale data until
+    its own entries expire.
+    """
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_BACKENDS:
+        return []
+    return [Warning(
+        'Кеш по умолчанию хранится в памяти процесса: изменения из других '
+        'процессов видны только после истечения срока хранения.',
+        hint='Укажите общий кеш в CACHE_BACKEND и CACHE_LOCATION, '
+             'например Memcached.',
+        id='core.W001',
+    )]
@@ -0,0 +1,57 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+# (model, counter field, counted model, foreign key to the model)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def change_counter(queryset, field, delta):
+    """Atomically shift a denormalized counter of the queryset rows.
+
+    A counter that has drifted below zero is clamped instead of failing
+    the request; ``recount_counters`` repairs it.
+    """
+    if delta > 0:
+        queryset.update(**{field: F(field) + delta})
+    elif delta < 0:
+        queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def actual_count(counted, foreign_key):
+    return Coalesce(Subquery(
+        counted.objects.filter(
+            **{foreign_key: OuterRef('pk')}
+        ).order_by().values(foreign_key).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def recount(fix=True, batch_size=10000):
+    """Compare counters with the source tables, fix them if asked.
+
+    Returns the number of drifted rows per ``model.field``.
+    """
+    drift = {}
+    for model, field, counted, foreign_key in COUNTERS:
+        drifted = list(
+            model.objects.annotate(
+                actual=actual_count(counted, foreign_key)
+            ).exclude(**{field: F('actual')}).values_list('pk', flat=True)
+        )
+        drift[f'{model._meta.model_name}.{field}'] = len(drifted)
+        if not fix:
+            continue
+        for start in range(0, len(drifted), batch_size):
+            model.objects.filter(
+                pk__in=drifted[start:start + batch_size]
+            ).update(**{field: actual_count(counted, foreign_key)})
+    return drift
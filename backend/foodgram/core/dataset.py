@@ -0,0 +1,206 @@
+import itertools
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from core import cart_totals, timelines, trending
+from core.counters import recount
+from recipes import postings, search
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+
+PRESETS = {
+    'small': {'users': 50, 'recipes': 200},
+    'medium': {'users': 5000, 'recipes': 50000},
+    'large': {'users': 100000, 'recipes': 1000000},
+}
+
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+
+DISHES = (
+    'суп', 'салат', 'пирог', 'омлет', 'рагу', 'каша', 'запеканка', 'плов',
+    'борщ', 'паста', 'котлеты', 'блины', 'оладьи', 'жаркое', 'гуляш',
+)
+ADJECTIVES = (
+    'домашний', 'быстрый', 'летний', 'сытный', 'лёгкий', 'пряный',
+    'острый', 'бабушкин', 'праздничный', 'постный', 'овощной', 'мясной',
+)
+STEPS = (
+    'Нарезать овощи кубиками.', 'Обжарить на сливочном масле.',
+    'Посолить и поперчить по вкусу.', 'Довести до кипения.',
+    'Тушить под крышкой двадцать минут.', 'Запекать в духовке.',
+    'Подавать горячим с зеленью.', 'Взбить яйца с молоком.',
+    'Замесить тесто и дать ему отдохнуть.', 'Отварить до готовности.',
+)
+
+# Average number of relations per generated user.
+FOLLOWS_PER_USER = 10
+FAVORITES_PER_USER = 20
+CARTS_PER_USER = 5
+# Share of users who publish recipes.
+AUTHORS_SHARE = 0.2
+
+
+def zipf_weights(size, exponent=1.1):
+    """Cumulative weights of a Zipf-like popularity distribution."""
+    return list(itertools.accumulate(
+        1 / (rank + 1) ** exponent for rank in range(size)
+    ))
+
+
+def sample_unique(rng, population, cum_weights, count):
+    """Pick up to ``count`` distinct items with popularity weights."""
+    count = min(count, len(population))
+    picked = set()
+    while len(picked) < count:
+        picked.update(rng.choices(
+            population, cum_weights=cum_weights, k=count - len(picked)
+        ))
+    return picked
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def bulk_insert(model, objects, batch_size):
+    """Insert objects in batches, one transaction per batch."""
+    created = 0
+    for batch in batched(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=batch_size)
+        created += len(batch)
+    return created
+
+
+def new_ids(model, after):
+    return list(
+        model.objects.filter(pk__gt=after).order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+
+def max_id(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return last or 0
+
+
+def generate_dataset(users, recipes, seed=0, batch_size=5000,
+                     password='foodgram', log=None):
+    """Append a synthetic dataset to the database.
+
+    Popularity of authors, recipes and ingredients follows a Zipf-like
+    distribution. Calling it again adds one more dataset of the same
+    size. Denormalized counters and cart totals are recomputed at the
+    end. Returns the number of created rows per model.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    created = {}
+
+    for name, color, slug in TAGS:
+        Tag.objects.get_or_create(
+            slug=slug, defaults={'name': name, 'color': color}
+        )
+    tag_ids = list(Tag.objects.order_by('pk').values_list('pk', flat=True))
+    if not Ingredient.objects.exists():
+        created['ingredients'] = bulk_insert(Ingredient, (
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(2000)
+        ), batch_size)
+    ingredient_ids = list(
+        Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+    )
+    rng.shuffle(ingredient_ids)
+    ingredient_weights = zipf_weights(len(ingredient_ids))
+
+    last_user = max_id(User)
+    password_hash = make_password(password)
+    created['users'] = bulk_insert(User, (
+        User(
+            email=f'user{last_user + index}@foodgram.example',
+            username=f'user{last_user + index}',
+            first_name='Пользователь',
+            last_name=str(last_user + index),
+            password=password_hash,
+        )
+        for index in range(1, users + 1)
+    ), batch_size)
+    user_ids = new_ids(User, last_user)
+    log(f'users: {len(user_ids)}')
+
+    author_ids = user_ids[:max(1, int(len(user_ids) * AUTHORS_SHARE))]
+    author_weights = zipf_weights(len(author_ids))
+    last_recipe = max_id(Recipe)
+    created['recipes'] = bulk_insert(Recipe, (
+        Recipe(
+            author_id=rng.choices(author_ids, cum_weights=author_weights)[0],
+            name=f'{rng.choice(ADJECTIVES)} {rng.choice(DISHES)}'.capitalize(),
+            image='static/recipes/generated.png',
+            text=' '.join(rng.sample(STEPS, rng.randint(2, 5))),
+            cooking_time=rng.randint(5, 180),
+        )
+        for _ in range(recipes)
+    ), batch_size)
+    recipe_ids = new_ids(Recipe, last_recipe)
+    log(f'recipes: {len(recipe_ids)}')
+
+    created['recipe_ingredients'] = bulk_insert(RecipeIngredient, (
+        RecipeIngredient(
+            recipe_id=recipe_id, ingredient_id=ingredient_id,
+            amount=rng.randint(1, 500),
+        )
+        for recipe_id in recipe_ids
+        for ingredient_id in sample_unique(
+            rng, ingredient_ids, ingredient_weights, rng.randint(3, 15)
+        )
+    ), batch_size)
+    log(f'recipe ingredients: {created["recipe_ingredients"]}')
+    created['recipe_tags'] = bulk_insert(Recipe.tags.through, (
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in rng.sample(tag_ids, rng.randint(1, len(tag_ids)))
+    ), batch_size)
+
+    created['follows'] = bulk_insert(Follow, (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in sample_unique(
+            rng, author_ids, author_weights,
+            rng.randint(1, 2 * FOLLOWS_PER_USER)
+        )
+        if author_id != user_id
+    ), batch_size)
+    log(f'follows: {created["follows"]}')
+
+    rng.shuffle(recipe_ids)
+    recipe_weights = zipf_weights(len(recipe_ids))
+    for model, average in (
+        (Favorite, FAVORITES_PER_USER), (ShoppingCart, CARTS_PER_USER)
+    ):
+        created[model._meta.model_name] = bulk_insert(model, (
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in sample_unique(
+                rng, recipe_ids, recipe_weights, rng.randint(1, 2 * average)
+            )
+        ), batch_size)
+        log(f'{model._meta.model_name}: {created[model._meta.model_name]}')
+    recount()
+    cart_totals.rebuild()
+    postings.rebuild()
+    search.rebuild()
+    timelines.rebuild()
+    trending.refresh()
+    return created
@@ -0,0 +1,138 @@
+import csv
+import itertools
+import json
+import os
+import re
+import time
+
+from core.versions import bump_version
+from recipes.ingredient_index import VERSION_NAME
+from recipes.models import Ingredient
+
+FIXTURE_MODEL = 'recipes.ingredient'
+CSV_HEADER = ('name', 'measurement_unit')
+WHITESPACE = re.compile(r'\s*')
+
+
+def read_csv(path):
+    """Stream (name, unit) pairs of a csv file, the header skipped."""
+    with open(path, encoding='utf8', newline='') as csvfile:
+        for row in csv.reader(csvfile):
+            if len(row) < 2 or tuple(row[:2]) == CSV_HEADER:
+                continue
+            yield row[0], row[1]
+
+
+def skip_whitespace(jsonfile, buffer, position, chunk_size):
+    """Skip whitespace, reading more of the file when the buffer ends.
+
+    Returns the buffer and the position of the next character, which is
+    at the end of the buffer only when the file is over.
+    """
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+        if position < len(buffer):
+            return buffer, position
+        chunk = jsonfile.read(chunk_size)
+        if not chunk:
+            return buffer, position
+        buffer, position = chunk, 0
+
+
+def iter_json_array(path, chunk_size=64 * 1024):
+    """Stream the items of a top-level JSON array.
+
+    Items must be separated by exactly one comma. An item is taken only
+    when a comma or the closing bracket follows it in the buffer: a
+    number cut at the end of a chunk decodes too, without its tail.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf8') as jsonfile:
+        buffer, position = skip_whitespace(jsonfile, '', 0, chunk_size)
+        if not buffer.startswith('[', position):
+            raise ValueError(f'{path}: ожидается json-массив')
+        buffer, position = skip_whitespace(
+            jsonfile, buffer, position + 1, chunk_size
+        )
+        if buffer.startswith(']', position):
+            return
+        while True:
+            if buffer.startswith((',', ']'), position):
+                raise json.JSONDecodeError(
+                    'Expecting value', buffer, position
+                )
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as error:
+                failure = error
+            else:
+                end = WHITESPACE.match(buffer, end).end()
+                failure = None
+                if not buffer.startswith((',', ']'), end):
+                    failure = json.JSONDecodeError(
+                        "Expecting ',' delimiter", buffer, end
+                    )
+            if failure is not None:
+                chunk = jsonfile.read(chunk_size)
+                if not chunk:
+                    raise failure
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            yield item
+            if buffer.startswith(']', end):
+                return
+            buffer, position = skip_whitespace(
+                jsonfile, buffer, end + 1, chunk_size
+            )
+
+
+def read_json(path):
+    """Ingredients of a list of objects or of a Django fixture."""
+    for item in iter_json_array(path):
+        if 'model' in item:
+            if item['model'] != FIXTURE_MODEL:
+                continue
+            item = item['fields']
+        yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+def read_ingredients(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f'{path}: неизвестный формат {extension}')
+    for name, measurement_unit in READERS[extension](path):
+        name, measurement_unit = name.strip(), measurement_unit.strip()
+        if name and measurement_unit:
+            yield name, measurement_unit
+
+
+def import_ingredients(path, batch_size=5000):
+    """Load ingredients in batches, skipping the existing ones.
+
+    A repeated run duplicates nothing: conflicts on the unique (name,
+    measurement unit) pair are ignored by the database. Returns the
+    numbers of read and inserted rows and the time taken.
+    """
+    started = time.monotonic()
+    before = Ingredient.objects.count()
+    rows = read_ingredients(path)
+    total = 0
+    while True:
+        batch = [
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in itertools.islice(rows, batch_size)
+        ]
+        if not batch:
+            break
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        total += len(batch)
+    inserted = Ingredient.objects.count() - before
+    if inserted:
+        bump_version(VERSION_NAME)
+    return total, inserted, time.monotonic() - started
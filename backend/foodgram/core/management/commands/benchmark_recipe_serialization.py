@@ -0,0 +1,86 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api import recipe_rows
+from api.serializers import GetRecipeSerializer
+from api.views import RecipeViewSet
+from users.models import User
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Команда сравнивающая скорость сериализации страниц рецептов '
+        'через GetRecipeSerializer и через recipe_rows'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[6, 50, 200],
+            help='Размеры страниц',
+        )
+        parser.add_argument(
+            '--seconds', type=float, default=2.0,
+            help='Длительность замера одного способа на одной странице, с',
+        )
+        parser.add_argument(
+            '--user', help='Email пользователя, от имени которого читать',
+        )
+
+    def make_request(self, email):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        if email is not None:
+            try:
+                request.user = User.objects.get(email=email)
+            except User.DoesNotExist:
+                raise CommandError(f'Пользователь {email} не найден')
+        return request
+
+    def rate(self, serialize, seconds):
+        """Pages per second, the queries of the page included."""
+        runs, started = 0, time.perf_counter()
+        while True:
+            serialize()
+            runs += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= seconds:
+                return runs / elapsed
+
+    def handle(self, *args, **options):
+        request = self.make_request(options['user'])
+        queryset = RecipeViewSet().get_queryset()
+        renderer = JSONRenderer()
+        for size in options['sizes']:
+            page = queryset.filter(pk__in=list(
+                queryset.order_by('-pub_date', '-id').values_list(
+                    'pk', flat=True
+                )[:size]
+            )).order_by('-pub_date', '-id')
+
+            def reference():
+                return GetRecipeSerializer(
+                    page.all(), many=True, context={'request': request}
+                ).data
+
+            def fast():
+                return recipe_rows.serialize(
+                    list(recipe_rows.rows(page.all())), request
+                )
+
+            if renderer.render(reference()) != renderer.render(fast()):
+                raise CommandError(
+                    f'Страница {size}: ответы сериализаторов различаются'
+                )
+            reference_rate = self.rate(reference, options['seconds'])
+            fast_rate = self.rate(fast, options['seconds'])
+            self.stdout.write(
+                f'page {size}: GetRecipeSerializer '
+                f'{reference_rate:.1f} стр./с ({reference_rate * size:.0f} '
+                f'рецептов/с), recipe_rows {fast_rate:.1f} стр./с '
+                f'({fast_rate * size:.0f} рецептов/с), '
+                f'x{fast_rate / reference_rate:.1f}'
+            )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core.similar import BATCH_SIZE, build
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Команда пересчитывающая похожие рецепты для рецептов с '
+        'изменившимися ингредиентами или тегами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать похожие рецепты для всех рецептов',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Число рецептов, сравниваемых за один шаг',
+        )
+
+    def handle(self, *args, **options):
+        count = build(full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'similar recipes: пересчитано {count}')
+        )
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.media_gc import collect_garbage
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Команда удаляющая картинки и уменьшенные копии, '
+        'на которые не ссылается ни один рецепт'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age-hours', type=float, default=24,
+            help='Не удалять файлы моложе указанного числа часов',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только сообщить, что будет удалено',
+        )
+
+    def handle(self, *args, **options):
+        removed, freed = collect_garbage(
+            timedelta(hours=options['min_age_hours']),
+            dry_run=options['dry_run'],
+        )
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {removed}, {freed} байт'
+        ))
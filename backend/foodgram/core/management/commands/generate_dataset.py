@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.dataset import PRESETS, generate_dataset
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Команда создающая синтетический набор пользователей, рецептов, '
+        'подписок, избранного и списков покупок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--preset', choices=PRESETS, default='small',
+            help='Размер набора данных',
+        )
+        parser.add_argument(
+            '--users', type=int, help='Число пользователей (вместо пресета)'
+        )
+        parser.add_argument(
+            '--recipes', type=int, help='Число рецептов (вместо пресета)'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed генератора случайных чисел',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Число строк в одном bulk_create',
+        )
+        parser.add_argument(
+            '--password', default='foodgram',
+            help='Пароль всех созданных пользователей',
+        )
+
+    def handle(self, *args, **options):
+        scale = dict(PRESETS[options['preset']])
+        for key in ('users', 'recipes'):
+            if options[key] is not None:
+                scale[key] = options[key]
+        started = time.monotonic()
+        created = generate_dataset(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            password=options['password'],
+            log=self.stdout.write,
+            **scale,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано строк: {sum(created.values())} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
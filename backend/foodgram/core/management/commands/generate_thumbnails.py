@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from recipes import thumbnails
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Команда создающая уменьшенные копии картинок рецептов, '
+        'у которых их ещё нет'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать копии всех картинок',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.only('image', 'thumbnails').order_by('pk')
+        created = failed = 0
+        for recipe in recipes.iterator():
+            if not (options['force'] and recipe.image
+                    or thumbnails.is_outdated(recipe)):
+                continue
+            try:
+                thumbnails.generate(recipe.id)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'{recipe.id}: {error}')
+                continue
+            created += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {created}, ошибок: {failed}'
+        ))
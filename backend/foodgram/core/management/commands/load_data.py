@@ -1,11 +1,32 @@
 from django.core.management.base import BaseCommand
 
-from core.csv_reader import create_ingredients
+from core.ingredient_import import import_ingredients
 
 
 class Command(BaseCommand):
 
-    help = 'Команда создающая dummy data для модели Ingredients'
+    help = (
+        'Команда загружающая ингредиенты из csv, json или фикстуры Django. '
+        'Уже существующие ингредиенты пропускаются'
+    )
 
-    def handle(self, *args, **kwargs):
-        create_ingredients()
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*', default=['data/ingredients.csv'],
+            help='Файлы .csv или .json',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Число строк в одном bulk_create',
+        )
+
+    def handle(self, *args, **options):
+        for path in options['paths']:
+            total, inserted, elapsed = import_ingredients(
+                path, batch_size=options['batch_size']
+            )
+            rate = total / elapsed if elapsed else total
+            self.stdout.write(self.style.SUCCESS(
+                f'{path}: добавлено {inserted}, пропущено {total - inserted}, '
+                f'{rate:.0f} строк/с'
+            ))
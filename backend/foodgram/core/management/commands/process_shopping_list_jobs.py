@@ -0,0 +1,41 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.shopping_list_jobs import fail_stale, process_pending, purge
+
+
+class Command(BaseCommand):
+
+    help = 'Команда формирующая PDF списков покупок из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, а ждать новые задачи',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза между проверками очереди, с',
+        )
+        parser.add_argument(
+            '--purge-hours', type=float, default=24,
+            help='Удалять готовые задачи и файлы старше стольких часов',
+        )
+
+    def handle(self, *args, **options):
+        older_than = datetime.timedelta(hours=options['purge_hours'])
+        while True:
+            failed = fail_stale()
+            processed = process_pending()
+            purged = purge(older_than)
+            if failed or processed or purged:
+                self.stdout.write(
+                    f'Обработано задач: {processed}, '
+                    f'просрочено: {failed}, удалено: {purged}'
+                )
+            if not options['loop']:
+                return
+            if not processed:
+                time.sleep(options['interval'])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipes.search import rebuild
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Команда сверяющая поисковый индекс рецептов с их названиями и '
+        'описаниями и перестраивающая расходящиеся'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сообщить о расхождениях, ничего не исправляя',
+        )
+
+    def handle(self, *args, **options):
+        drift = rebuild(fix=not options['check'])
+        style = self.style.WARNING if drift else self.style.SUCCESS
+        self.stdout.write(style(f'search index: расхождений {drift}'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.timelines import rebuild
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Команда сверяющая ленты рецептов с подписками и '
+        'исправляющая расходящиеся записи'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сообщить о расхождениях, ничего не исправляя',
+        )
+
+    def handle(self, *args, **options):
+        drift = rebuild(fix=not options['check'])
+        style = self.style.WARNING if drift else self.style.SUCCESS
+        self.stdout.write(style(f'timelines: расхождений {drift}'))
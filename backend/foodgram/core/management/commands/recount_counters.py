@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import recount
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Команда пересчитывающая счётчики избранного, списков покупок, '
+        'рецептов и подписчиков и сообщающая о расхождениях'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сообщить о расхождениях, ничего не исправляя',
+        )
+
+    def handle(self, *args, **options):
+        drift = recount(fix=not options['check'])
+        for counter, rows in drift.items():
+            style = self.style.WARNING if rows else self.style.SUCCESS
+            self.stdout.write(style(f'{counter}: расхождений {rows}'))
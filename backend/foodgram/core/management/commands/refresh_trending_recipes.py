@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.trending import refresh
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Команда пересчитывающая популярность рецептов по недавним '
+        'добавлениям в избранное и в списки покупок; запускается по '
+        'расписанию'
+    )
+
+    def handle(self, *args, **options):
+        count = refresh()
+        self.stdout.write(
+            self.style.SUCCESS(f'trending recipes: оценено {count}')
+        )
@@ -0,0 +1,54 @@
+import posixpath
+
+from django.utils import timezone
+
+from recipes import thumbnails
+from recipes.models import Recipe
+
+ROOTS = ('static/recipes/',)
+
+
+def referenced_names():
+    """Names of every recipe image and thumbnail in the database."""
+    names = set()
+    for image, recipe_thumbnails in Recipe.objects.values_list(
+        'image', 'thumbnails'
+    ).iterator(chunk_size=5000):
+        names.add(image)
+        names.update(thumbnails.stored_names(recipe_thumbnails or {}))
+    return names
+
+
+def walk(storage, directory):
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for name in directories:
+        yield from walk(storage, posixpath.join(directory, name))
+
+
+def collect_garbage(min_age, dry_run=False):
+    """Удаляет файлы картинок, на которые не ссылается ни один рецепт.
+
+    Файлы моложе ``min_age`` не трогаются: они могут принадлежать ещё
+    не завершённой загрузке. Повторная загрузка обновляет время
+    изменения файла, а срок отсчитывается от момента до чтения ссылок,
+    поэтому файл, загруженный заново во время сборки, тоже остаётся.
+    Время изменения проверяется непосредственно перед удалением.
+    Возвращает число и общий размер удалённых файлов.
+    """
+    storage = thumbnails.get_storage()
+    cutoff = timezone.now() - min_age
+    referenced = referenced_names()
+    removed = freed = 0
+    for root in ROOTS:
+        for name in walk(storage, root.rstrip('/')):
+            if name in referenced or storage.get_modified_time(name) > cutoff:
+                continue
+            freed += storage.size(name)
+            removed += 1
+            if not dry_run:
+                storage.delete(name)
+    return removed, freed
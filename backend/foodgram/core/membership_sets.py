@@ -0,0 +1,110 @@
+"""Per-user sets of favorite recipes, cart recipes and followed authors.
+
+Serializers answer ``is_favorited``, ``is_in_shopping_cart`` and
+``is_subscribed`` with a membership check instead of a query per row.
+A set is loaded from the database once, stored in the shared cache as
+a sorted array of ids and memoized on the request. Each set has its own
+version per user, bumped after a change commits, so a reader that raced
+the change can only fill the cache under the outdated version. Changes
+made outside the API, e.g. in the admin, show up after
+``MEMBERSHIP_SETS_TIMEOUT``, and so do all changes made by other
+processes when the cache is local to the process (check ``core.W001``).
+"""
+import bisect
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.versions import bump_versions, get_version
+from recipes.models import Favorite, ShoppingCart
+from users.models import Follow
+
+FAVORITES = 'favorites'
+CART = 'cart'
+FOLLOWS = 'follows'
+
+# kind: (model, member id field)
+KINDS = {
+    FAVORITES: (Favorite, 'recipe_id'),
+    CART: (ShoppingCart, 'recipe_id'),
+    FOLLOWS: (Follow, 'author_id'),
+}
+KIND_OF_MODEL = {model: kind for kind, (model, _) in KINDS.items()}
+REQUEST_ATTRIBUTE = '_membership_sets'
+
+
+class IdSet:
+    """Immutable set of ids backed by a sorted array."""
+
+    __slots__ = ('ids',)
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __contains__(self, pk):
+        position = bisect.bisect_left(self.ids, pk)
+        return position < len(self.ids) and self.ids[position] == pk
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_ids(cls, ids):
+        ids = sorted(ids)
+        typecode = 'I' if not ids or ids[-1] < 2 ** 32 else 'Q'
+        return cls(array(typecode, ids))
+
+    def pack(self):
+        return self.ids.typecode, self.ids.tobytes()
+
+    @classmethod
+    def unpack(cls, packed):
+        typecode, data = packed
+        ids = array(typecode)
+        ids.frombytes(data)
+        return cls(ids)
+
+
+EMPTY = IdSet.from_ids(())
+
+
+def version_name(kind, user_id):
+    return f'{kind}-ids:{user_id}'
+
+
+def load(kind, user_id):
+    """The user's set from the shared cache or the database."""
+    version = get_version(version_name(kind, user_id))
+    key = f'membership:{kind}:{user_id}:{version}'
+    packed = cache.get(key)
+    if packed is not None:
+        return IdSet.unpack(packed)
+    model, field = KINDS[kind]
+    id_set = IdSet.from_ids(
+        model.objects.filter(user_id=user_id).order_by().values_list(
+            field, flat=True
+        )
+    )
+    cache.set(key, id_set.pack(), settings.MEMBERSHIP_SETS_TIMEOUT)
+    return id_set
+
+
+def for_request(request, kind):
+    """The set of the request's user, loaded at most once per request."""
+    if request is None or not request.user.is_authenticated:
+        return EMPTY
+    sets = getattr(request, REQUEST_ATTRIBUTE, None)
+    if sets is None:
+        sets = {}
+        setattr(request, REQUEST_ATTRIBUTE, sets)
+    if kind not in sets:
+        sets[kind] = load(kind, request.user.id)
+    return sets[kind]
+
+
+def invalidate(kind, user_ids):
+    """Drop the cached sets once the current transaction commits."""
+    names = [version_name(kind, user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: bump_versions(names))
@@ -0,0 +1,73 @@
+"""Adding recipes to favorites and the shopping cart.
+
+Every change locks the user's row first, so concurrent requests of one
+user (double clicks, parallel tabs) are applied one after another: the
+rows that really changed are known exactly and counters and cart totals
+move by the right amount. Adding a present recipe or removing an absent
+one is a no-op, so the operations are idempotent.
+"""
+from django.db import transaction
+
+from core import cart_totals, membership_sets
+from core.counters import change_counter
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'carts_count',
+}
+
+
+def lock_user(user_id):
+    list(
+        User.objects.select_for_update().filter(pk=user_id)
+        .values_list('pk', flat=True)
+    )
+
+
+def present(model, user_id, recipe_ids):
+    return set(model.objects.filter(
+        user_id=user_id, recipe_id__in=recipe_ids
+    ).values_list('recipe_id', flat=True))
+
+
+@transaction.atomic
+def add(model, user_id, recipe_ids):
+    """Add the recipes, return the ids that were not there yet."""
+    lock_user(user_id)
+    added = set(recipe_ids) - present(model, user_id, recipe_ids)
+    if added:
+        model.objects.bulk_create(
+            (model(user_id=user_id, recipe_id=pk) for pk in added),
+            ignore_conflicts=True,
+        )
+        change_counter(
+            Recipe.objects.filter(id__in=added), COUNTERS[model], 1
+        )
+        if model is ShoppingCart:
+            cart_totals.add_recipes(user_id, added)
+        membership_sets.invalidate(
+            membership_sets.KIND_OF_MODEL[model], [user_id]
+        )
+    return added
+
+
+@transaction.atomic
+def remove(model, user_id, recipe_ids):
+    """Remove the recipes, return the ids that were there."""
+    lock_user(user_id)
+    removed = present(model, user_id, recipe_ids)
+    if removed:
+        model.objects.filter(
+            user_id=user_id, recipe_id__in=removed
+        ).delete()
+        change_counter(
+            Recipe.objects.filter(id__in=removed), COUNTERS[model], -1
+        )
+        if model is ShoppingCart:
+            cart_totals.remove_recipes(user_id, removed)
+        membership_sets.invalidate(
+            membership_sets.KIND_OF_MODEL[model], [user_id]
+        )
+    return removed
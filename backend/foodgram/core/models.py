@@ -0,0 +1,20 @@
+class MaintainedFieldsMixin:
+    """Leave columns kept by queryset updates out of full saves.
+
+    Counters and other derived columns are changed with ``UPDATE ... SET
+    field = F(field) + 1`` by concurrent requests and background jobs. A
+    plain ``save()`` of a row loaded earlier would write their stale values
+    back, so on existing rows it saves every column but those listed in
+    ``maintained_fields``. Pass ``update_fields`` to write one of them.
+    """
+
+    maintained_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.maintained_fields
+            ]
+        super().save(*args, **kwargs)
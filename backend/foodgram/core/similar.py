@@ -0,0 +1,307 @@
+"""Precomputed similar recipes.
+
+Recipes are rows of a binary recipe-by-feature matrix, where features
+are ingredients and tags, and are compared with the Jaccard index of
+their feature sets. ``SimilarRecipe`` keeps the ``SIMILAR_RECIPES_COUNT``
+best neighbours of every recipe, so the API reads them with one indexed
+query.
+
+The most frequent features (tags, salt, eggs...) would make almost
+every pair of recipes a candidate, so up to ``COMMON_FEATURES`` of the
+ones used by more than ``COMMON_MIN_RECIPES`` recipes are kept as a
+64-bit mask per recipe and only the rarer features go to the sparse
+matrix. Candidates of a batch of recipes come from one
+sparse product with the rare features; shared common features are then
+added with a popcount of the masks. A recipe made of common features
+only has no row in the sparse product, so it is compared with every
+recipe by the masks alone, once per distinct mask of a batch; other
+recipes still find their candidates through rare features only. Memory
+stays bounded by the matrix and one batch, which keeps a million
+recipes on one machine.
+
+``RecipeSerializer`` marks recipes with changed ingredients or tags as
+``similar_outdated``. An incremental build recomputes those recipes and
+the recipes whose lists they enter or leave.
+"""
+from array import array
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from scipy import sparse
+
+from recipes.models import Recipe, RecipeIngredient, SimilarRecipe
+
+COMMON_FEATURES = 64
+COMMON_MIN_RECIPES = 1000
+BATCH_SIZE = 500
+IDS_BATCH_SIZE = 5000
+BIT_COUNTS = np.array(
+    [bin(value).count('1') for value in range(1 << 16)], dtype=np.uint8
+)
+
+
+def popcount(masks):
+    return BIT_COUNTS[masks.view(np.uint16)].reshape(-1, 4).sum(axis=1)
+
+
+def best(scores, count):
+    """Indices of the ``count`` highest positive scores.
+
+    Ties go to the lower indices, as in ``top``.
+    """
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) <= count:
+        return candidates
+    values = scores[candidates]
+    low = np.partition(values, len(values) - count)[len(values) - count]
+    above = candidates[values > low]
+    return np.concatenate((
+        above, candidates[values == low][:count - len(above)]
+    ))
+
+
+def id_pairs(queryset, first, second):
+    left, right = array('q'), array('q')
+    for first_id, second_id in queryset.values_list(
+        first, second
+    ).iterator(chunk_size=IDS_BATCH_SIZE):
+        left.append(first_id)
+        right.append(second_id)
+    return (
+        np.asarray(left, dtype=np.int64), np.asarray(right, dtype=np.int64)
+    )
+
+
+class FeatureMatrix:
+    """Recipe features split into a sparse rare part and common masks."""
+
+    def __init__(self, recipe_ids, rows, features):
+        self.recipe_ids = recipe_ids
+        size = len(recipe_ids)
+        frequency = np.bincount(features)
+        common = np.argsort(-frequency, kind='stable')[:COMMON_FEATURES]
+        common = common[frequency[common] > COMMON_MIN_RECIPES]
+        bits = np.full(len(frequency), -1)
+        bits[common] = np.arange(len(common))
+        is_common = bits[features] >= 0
+        self.masks = np.zeros(size, dtype=np.uint64)
+        np.bitwise_or.at(
+            self.masks, rows[is_common],
+            np.left_shift(
+                np.uint64(1), bits[features[is_common]].astype(np.uint64)
+            ),
+        )
+        rare_rows, rare_features = rows[~is_common], features[~is_common]
+        self.rare = sparse.csr_matrix(
+            (np.ones(len(rare_rows), dtype=np.int32),
+             (rare_rows, rare_features)),
+            shape=(size, len(frequency)),
+        )
+        self.rare_t = self.rare.T.tocsr()
+        self.sizes = np.bincount(rows, minlength=size)
+        self.common_only = (np.diff(self.rare.indptr) == 0) & (self.masks > 0)
+
+    @classmethod
+    def load(cls):
+        recipe_ids = np.asarray(
+            array('q', Recipe.objects.order_by('id').values_list(
+                'id', flat=True
+            ).iterator(chunk_size=IDS_BATCH_SIZE)),
+            dtype=np.int64,
+        )
+        ingredient_recipes, ingredients = id_pairs(
+            RecipeIngredient.objects.all(), 'recipe_id', 'ingredient_id'
+        )
+        tag_recipes, tags = id_pairs(
+            Recipe.tags.through.objects.all(), 'recipe_id', 'tag_id'
+        )
+        _, ingredients = np.unique(ingredients, return_inverse=True)
+        _, tags = np.unique(tags, return_inverse=True)
+        features = np.concatenate((
+            ingredients, tags + (ingredients.max(initial=-1) + 1)
+        ))
+        recipes = np.concatenate((ingredient_recipes, tag_recipes))
+        rows = np.searchsorted(recipe_ids, recipes)
+        # Recipes created while loading are left for the next build.
+        known = rows < len(recipe_ids)
+        known[known] = recipe_ids[rows[known]] == recipes[known]
+        return cls(recipe_ids, rows[known], features[known])
+
+    def rows_of(self, ids):
+        """Rows of the recipes with the given ids, sorted."""
+        return np.intersect1d(
+            self.recipe_ids, ids, return_indices=True
+        )[1]
+
+    def mask_scores(self, row, columns):
+        """Scores of the row with the columns by the common features.
+
+        Exact when the row or the columns have no rare features.
+        """
+        shared = popcount(self.masks[columns] & self.masks[row])
+        return shared / (self.sizes[row] + self.sizes[columns] - shared)
+
+    def pairs(self, rows, count=None):
+        """Candidate pairs of the rows as (rows, columns, scores).
+
+        With ``count``, the rows made of common features only get their
+        ``count`` best candidates by the masks.
+        """
+        shared = (self.rare[rows] @ self.rare_t).tocoo()
+        left, right = rows[shared.row], shared.col
+        other = left != right
+        left, right = left[other], right[other]
+        common = popcount(self.masks[left] & self.masks[right])
+        shared = shared.data[other] + common
+        scores = shared / (self.sizes[left] + self.sizes[right] - shared)
+        if count is None:
+            return left, right, scores
+        return tuple(
+            np.concatenate(parts) for parts in zip(
+                (left, right, scores), *self.common_pairs(rows, count)
+            )
+        )
+
+    def common_pairs(self, rows, count):
+        """Pairs of the rows without rare features, grouped by row."""
+        rows = rows[self.common_only[rows]]
+        masks, groups = np.unique(self.masks[rows], return_inverse=True)
+        everything = slice(None)
+        for index in range(len(masks)):
+            group = rows[groups.ravel() == index]
+            scores = self.mask_scores(group[0], everything)
+            # One more, for the recipe itself.
+            candidates = best(scores, count + 1)
+            for row in group.tolist():
+                right = candidates[candidates != row]
+                yield np.full(len(right), row), right, scores[right]
+
+
+def top(left, right, scores, count):
+    """The ``count`` best pairs of every row, best first.
+
+    Pairs come grouped by row, as ``FeatureMatrix.pairs`` returns them.
+    """
+    starts = np.flatnonzero(np.r_[True, left[1:] != left[:-1]])
+    ends = np.r_[starts[1:], len(left)]
+    kept = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        row_scores = scores[start:end]
+        best = np.arange(end - start)
+        if end - start > count:
+            best = np.argpartition(-row_scores, count - 1)[:count]
+        best = best[np.lexsort((right[start:end][best], -row_scores[best]))]
+        kept.append(best + start)
+    kept = np.concatenate(kept) if kept else np.arange(0)
+    return left[kept], right[kept], scores[kept]
+
+
+def thresholds(matrix):
+    """Score a candidate needs to enter the list of every recipe."""
+    needed = np.zeros(len(matrix.recipe_ids))
+    ids, lows = [], []
+    for recipe_id, low in SimilarRecipe.objects.values('recipe_id').annotate(
+        total=Count('id'), low=Min('score')
+    ).filter(
+        total__gte=settings.SIMILAR_RECIPES_COUNT
+    ).values_list('recipe_id', 'low').iterator():
+        ids.append(recipe_id)
+        lows.append(low)
+    _, rows, positions = np.intersect1d(
+        matrix.recipe_ids, np.asarray(ids, dtype=np.int64),
+        return_indices=True,
+    )
+    needed[rows] = np.asarray(lows)[positions]
+    return needed
+
+
+def batches(values, size):
+    return (
+        values[start:start + size] for start in range(0, len(values), size)
+    )
+
+
+def affected_rows(matrix, dirty, batch_size):
+    """Rows whose lists a change of the ``dirty`` rows may alter."""
+    affected = set(dirty.tolist())
+    needed = thresholds(matrix)
+    for rows in batches(dirty, batch_size):
+        _, right, scores = matrix.pairs(rows)
+        affected.update(right[scores >= needed[right]].tolist())
+    # Recipes without rare features take candidates from all recipes.
+    common_only = np.flatnonzero(matrix.common_only)
+    for row in dirty.tolist():
+        scores = matrix.mask_scores(row, common_only)
+        affected.update(common_only[
+            (scores > 0) & (scores >= needed[common_only])
+        ].tolist())
+    for ids in batches(matrix.recipe_ids[dirty], IDS_BATCH_SIZE):
+        affected.update(matrix.rows_of(np.fromiter(
+            SimilarRecipe.objects.filter(similar_id__in=ids.tolist())
+            .values_list('recipe_id', flat=True).distinct(),
+            dtype=np.int64,
+        )).tolist())
+    return np.array(sorted(affected), dtype=np.int64)
+
+
+def write(matrix, rows, batch_size):
+    count = settings.SIMILAR_RECIPES_COUNT
+    # Common-only rows last, grouped by mask: a batch compares every
+    # distinct mask with all recipes once.
+    common = matrix.common_only[rows]
+    rows = np.concatenate((
+        rows[~common],
+        rows[common][np.argsort(matrix.masks[rows[common]], kind='stable')],
+    ))
+    for batch in batches(rows, batch_size):
+        left, right, scores = top(*matrix.pairs(batch, count), count)
+        ids = matrix.recipe_ids
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(
+                recipe_id__in=ids[batch].tolist()
+            ).delete()
+            SimilarRecipe.objects.bulk_create(
+                (
+                    SimilarRecipe(
+                        recipe_id=recipe_id, similar_id=similar_id,
+                        score=score,
+                    )
+                    for recipe_id, similar_id, score in zip(
+                        ids[left].tolist(), ids[right].tolist(),
+                        scores.tolist(),
+                    )
+                ),
+                batch_size=IDS_BATCH_SIZE,
+            )
+
+
+def mark(recipe_ids, outdated):
+    for ids in batches(recipe_ids, IDS_BATCH_SIZE):
+        Recipe.objects.filter(id__in=ids).update(similar_outdated=outdated)
+
+
+def build(full=False, batch_size=BATCH_SIZE):
+    """Recompute outdated lists, or all of them; return how many."""
+    outdated = Recipe.objects.all()
+    if not full:
+        outdated = outdated.filter(similar_outdated=True)
+    outdated = list(outdated.order_by('id').values_list('id', flat=True))
+    if not outdated:
+        return 0
+    # Cleared first: a recipe changed during the build is marked again
+    # and picked up by the next one.
+    mark(outdated, False)
+    try:
+        matrix = FeatureMatrix.load()
+        dirty = matrix.rows_of(np.asarray(outdated, dtype=np.int64))
+        rows = (
+            np.arange(len(matrix.recipe_ids)) if full
+            else affected_rows(matrix, dirty, batch_size)
+        )
+        write(matrix, rows, batch_size)
+    except BaseException:
+        mark(outdated, True)
+        raise
+    return len(rows)
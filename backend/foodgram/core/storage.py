@@ -0,0 +1,87 @@
+"""Content-addressed file storage.
+
+A file is stored under the SHA-256 of its bytes, sharded into two levels
+of subdirectories: ``static/recipes/ab/cd/abcd….png``. Saving bytes
+that are already stored returns the existing name without writing, so
+re-uploads of the same image cost nothing and no directory grows past a
+few hundred entries. Files are never overwritten with other bytes,
+which makes them safe to cache forever; orphans are removed by the
+``collect_media_garbage`` command. A re-upload touches the stored file:
+the collector leaves recently modified files alone, so it does not
+delete a file that a new, maybe not yet committed, row points at.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+TEMPORARY_PREFIX = '.upload-'
+
+
+def content_digest(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def content_name(name, digest):
+    """``dir/ab/cd/<digest><ext>`` for a file uploaded as ``dir/name``."""
+    shards = [
+        digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH]
+        for level in range(SHARD_LEVELS)
+    ]
+    extension = os.path.splitext(name)[1].lower()
+    return posixpath.join(
+        posixpath.dirname(name), *shards, digest + extension
+    )
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = content_name(name, content_digest(content))
+        try:
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # The name is derived from the bytes: an existing file with this
+        # name already holds them.
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        # Write next to the target and rename: concurrent uploads of the
+        # same bytes replace each other atomically.
+        descriptor, temporary = tempfile.mkstemp(
+            dir=directory, prefix=TEMPORARY_PREFIX
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(
+                        chunk if isinstance(chunk, bytes) else chunk.encode()
+                    )
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+            os.replace(temporary, full_path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
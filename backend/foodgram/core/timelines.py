@@ -0,0 +1,172 @@
+"""Feeds of the recipes of followed authors.
+
+``TimelineEntry`` keeps the recipes of every user's followed authors, so
+a feed is read from the user's own rows instead of filtering recipes by
+hundreds of authors. A new recipe is fanned out to the followers of its
+author on create, a subscription backfills the author's latest
+``FEED_BACKFILL_SIZE`` recipes and unsubscribing drops the author's
+entries. Authors with more than ``FEED_FANOUT_LIMIT`` followers are not
+fanned out: their recipes are merged into the feed when it is read.
+When an unsubscription brings an author back to the limit, their latest
+recipes are backfilled to every follower, as the ones published above
+the limit were never fanned out. ``rebuild`` does the same for authors
+who lost followers by other means.
+"""
+import collections
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from core.cart_totals import chunks
+from recipes.models import Recipe, TimelineEntry
+from users.models import Follow, User
+
+USERS_BATCH_SIZE = 500
+ENTRIES_BATCH_SIZE = 1000
+
+
+def is_popular(author):
+    return author.followers_count > settings.FEED_FANOUT_LIMIT
+
+
+def recipe_created(recipe):
+    """Add a new recipe to the timelines of its author's followers."""
+    # One more row than the limit tells a popular author apart without
+    # reading all of their followers.
+    followers = list(Follow.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)[:settings.FEED_FANOUT_LIMIT + 1])
+    if followers and len(followers) <= settings.FEED_FANOUT_LIMIT:
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(user_id=user_id, recipe_id=recipe.id)
+                for user_id in followers
+            ),
+            batch_size=ENTRIES_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+def latest_recipes(author_ids):
+    """{author id: ids of their latest ``FEED_BACKFILL_SIZE`` recipes}."""
+    latest = collections.defaultdict(list)
+    for author_id, recipe_id in Recipe.objects.filter(
+        author_id__in=author_ids
+    ).order_by('author_id', '-pub_date', '-id').values_list(
+        'author_id', 'id'
+    ).iterator():
+        if len(latest[author_id]) < settings.FEED_BACKFILL_SIZE:
+            latest[author_id].append(recipe_id)
+    return latest
+
+
+def subscribed(user_id, author):
+    """Backfill the timeline with the latest recipes of a new author."""
+    if not author.recipes_count or is_popular(author):
+        return
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in latest_recipes([author.id])[author.id]
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def unsubscribed(user_id, author):
+    TimelineEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author.id
+    ).delete()
+    if is_popular(author):
+        transaction.on_commit(lambda: no_longer_popular(author.id))
+
+
+def no_longer_popular(author_id, batch_size=USERS_BATCH_SIZE):
+    """Backfill the followers of an author who dropped to the limit."""
+    if User.objects.filter(
+        id=author_id, followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).exists():
+        return
+    recipe_ids = latest_recipes([author_id])[author_id]
+    if not recipe_ids:
+        return
+    for users in chunks(
+        Follow.objects.filter(author_id=author_id).values_list(
+            'user_id', flat=True
+        ),
+        batch_size,
+    ):
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(user_id=user_id, recipe_id=recipe_id)
+                for user_id in users
+                for recipe_id in recipe_ids
+            ),
+            batch_size=ENTRIES_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+def feed(user_id, queryset):
+    """Recipes of ``queryset`` in the feed of the user."""
+    condition = Q(pk__in=TimelineEntry.objects.filter(
+        user_id=user_id
+    ).values('recipe_id'))
+    popular = list(Follow.objects.filter(
+        user_id=user_id,
+        author__followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True))
+    if popular:
+        condition |= Q(author_id__in=popular)
+    return queryset.filter(condition)
+
+
+def rebuild(fix=True, batch_size=USERS_BATCH_SIZE):
+    """Backfill missing entries and drop ones of unfollowed authors.
+
+    Recipes fanned out beyond the backfill are kept. Returns the number
+    of missing and stale entries.
+    """
+    user_ids = set(Follow.objects.values_list('user_id', flat=True))
+    user_ids.update(TimelineEntry.objects.values_list('user_id', flat=True))
+    drift = 0
+    for users in chunks(user_ids, batch_size):
+        follows = set(Follow.objects.filter(user_id__in=users).values_list(
+            'user_id', 'author_id'
+        ))
+        backfilled = collections.defaultdict(list)
+        for user_id, author_id in Follow.objects.filter(
+            user_id__in=users,
+            author__followers_count__lte=settings.FEED_FANOUT_LIMIT,
+        ).values_list('user_id', 'author_id'):
+            backfilled[author_id].append(user_id)
+        latest = latest_recipes(backfilled)
+        expected = {
+            (user_id, recipe_id)
+            for author_id, followers in backfilled.items()
+            for user_id in followers
+            for recipe_id in latest[author_id]
+        }
+        stored, stale = set(), []
+        for pk, user_id, recipe_id, author_id in TimelineEntry.objects.filter(
+            user_id__in=users
+        ).values_list('pk', 'user_id', 'recipe_id', 'recipe__author_id'):
+            stored.add((user_id, recipe_id))
+            if (user_id, author_id) not in follows:
+                stale.append(pk)
+        missing = expected - stored
+        drift += len(missing) + len(stale)
+        if not fix or not (missing or stale):
+            continue
+        with transaction.atomic():
+            TimelineEntry.objects.filter(pk__in=stale).delete()
+            TimelineEntry.objects.bulk_create(
+                (
+                    TimelineEntry(user_id=user_id, recipe_id=recipe_id)
+                    for user_id, recipe_id in missing
+                ),
+                batch_size=ENTRIES_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+    return drift
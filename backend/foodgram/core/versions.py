@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = 'version'
+
+
+def make_key(name):
+    return f'{KEY_PREFIX}:{name}'
+
+
+def get_version(name):
+    """Current version of a cached data set.
+
+    A missing version starts from the current time, so a cache that
+    lost its keys never hands out a version that was already used.
+    """
+    key = make_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), settings.CACHE_VERSIONS_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """Invalidate everything cached under the previous version."""
+    key = make_key(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, settings.CACHE_VERSIONS_TIMEOUT)
+        return version
+
+
+def bump_versions(names):
+    """Invalidate several versions in one cache round trip.
+
+    A deleted version restarts from the current time on next read.
+    """
+    cache.delete_many([make_key(name) for name in names])
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
+    'core.apps.CoreConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -91,10 +92,19 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny',],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 }
 
@@ -135,3 +145,65 @@ AUTH_USER_MODEL = 'users.User'
 EMPTY_VALUE_DISPLAY = '-пусто-'
 
 FONTS_ROOT = os.path.join(BASE_DIR, 'fonts/')
+
+INGREDIENT_INDEX_TTL = 60 * 60
+
+# Cached tag and ingredient list responses of VersionedListCacheMixin.
+# Not longer than INGREDIENT_INDEX_TTL, so an ingredient search is not
+# served from a response older than the index it was found in.
+LIST_CACHE_TIMEOUT = INGREDIENT_INDEX_TTL
+
+# Cached shopping list files and membership sets. They are invalidated by
+# versions stored in CACHES, so with the default process-local LocMemCache
+# changes made by other workers or commands show up only after these
+# timeouts (check core.W001). Production should use a shared cache.
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 5
+
+MEMBERSHIP_SETS_TIMEOUT = 60 * 5
+
+# Versions of cached data sets, see core.versions. A process-local cache
+# never sees bumps from other processes, so there they expire as well and
+# restart from a new value.
+CACHE_VERSIONS_TIMEOUT = (
+    60 * 5 if CACHES['default']['BACKEND'].endswith('.LocMemCache') else None
+)
+
+# Token lookups cached by api.authentication.CachedTokenAuthentication.
+# SHARED also stores them in CACHES and revokes them in every worker at
+# once; it needs a cache shared by the workers, e.g. Redis or Memcached.
+TOKEN_AUTH_CACHE = {
+    'SIZE': 10000,
+    'TTL': 60 * 5,
+    'SHARED': os.getenv('TOKEN_AUTH_CACHE_SHARED', '') == 'True',
+}
+
+# 'thread': render shopping lists in a thread pool of the web process,
+# 'queue': leave them to the process_shopping_list_jobs command.
+SHOPPING_LIST_JOBS_MODE = os.getenv('SHOPPING_LIST_JOBS_MODE', 'thread')
+SHOPPING_LIST_JOBS_WORKERS = 2
+# Jobs still running this many seconds after a worker took them are
+# failed as their worker died. In 'thread' mode so are jobs still pending
+# this long after they were created; queued jobs wait for the command.
+SHOPPING_LIST_JOBS_TIMEOUT = 60 * 10
+
+# Widths of recipe image thumbnails, generated as WebP and JPEG.
+RECIPE_THUMBNAIL_WIDTHS = (150, 300, 600)
+# 'thread': generate thumbnails in a thread pool after the upload commits,
+# 'sync': generate them inside the request.
+RECIPE_THUMBNAILS_MODE = os.getenv('RECIPE_THUMBNAILS_MODE', 'thread')
+RECIPE_THUMBNAILS_WORKERS = 2
+
+# Authors with more followers are not fanned out to the timelines of
+# their followers: their recipes are merged into a feed when it is read.
+FEED_FANOUT_LIMIT = 10000
+# Latest recipes of an author added to a timeline on subscription.
+FEED_BACKFILL_SIZE = 20
+
+# Neighbours per recipe kept by the build_similar_recipes command.
+SIMILAR_RECIPES_COUNT = 10
+
+# Trending scores, refreshed by the refresh_trending_recipes command:
+# favorites and carts of the last TRENDING_WINDOW_DAYS, each worth half
+# as much every TRENDING_HALF_LIFE_HOURS.
+TRENDING_WINDOW_DAYS = 14
+TRENDING_HALF_LIFE_HOURS = 72
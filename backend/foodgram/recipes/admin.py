@@ -18,7 +18,7 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @admin.display(description='Число добавлений рецепта в избранное')
     def count(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -40,9 +40,22 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe', )
 
 
+class CartIngredientAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'total_amount', )
+
+
+class ShoppingListJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'user', 'status', 'created', 'started', 'finished',
+    )
+    list_filter = ('status', )
+
+
 admin.site.register(models.Ingredient, IngredientAdmin)
 admin.site.register(models.Recipe, RecipeAdmin)
 admin.site.register(models.Tag, TagAdmin)
 admin.site.register(models.RecipeIngredient, RecipeIngredientAdmin)
 admin.site.register(models.Favorite, FavoriteAdmin)
 admin.site.register(models.ShoppingCart, ShoppingCartAdmin)
+admin.site.register(models.CartIngredient, CartIngredientAdmin)
+admin.site.register(models.ShoppingListJob, ShoppingListJobAdmin)
@@ -0,0 +1,121 @@
+"""In-process ingredient autocomplete index.
+
+Every worker keeps a case-folded, sorted copy of the ingredient catalog
+and answers name lookups with bisect, without a database round trip.
+The index is rebuilt lazily when the ``ingredients`` version is bumped
+or when it gets older than ``settings.INGREDIENT_INDEX_TTL`` seconds,
+which keeps popularity fresh without invalidating on every recipe save.
+"""
+import bisect
+import itertools
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count
+
+from core.versions import get_version
+
+from .models import Ingredient
+
+VERSION_NAME = 'ingredients'
+SEPARATOR = '\n'
+
+
+class IngredientIndex:
+    """Sorted prefix index ranked by usage in recipes."""
+
+    def __init__(self, rows):
+        entries = sorted(
+            (name.casefold(), -popularity, pk, {
+                'id': pk, 'name': name, 'measurement_unit': unit,
+            })
+            for pk, name, unit, popularity in rows
+        )
+        self.names = [entry[0] for entry in entries]
+        self.popularity = [-entry[1] for entry in entries]
+        self.items = [entry[3] for entry in entries]
+        by_popularity = sorted(
+            range(len(entries)),
+            key=lambda position: (-self.popularity[position], position)
+        )
+        # Names in popularity order joined into one string: substring
+        # lookups run as str.find instead of a Python loop.
+        self.haystack = SEPARATOR.join(
+            self.names[position] for position in by_popularity
+        )
+        # No accumulate(initial=...): the image runs Python 3.7.
+        self.starts = [0, *itertools.accumulate(
+            len(self.names[position]) + 1 for position in by_popularity
+        )]
+        self.by_popularity = by_popularity
+
+    def find_substrings(self, query, limit):
+        found = []
+        offset = self.haystack.find(query)
+        while offset != -1 and (limit is None or len(found) < limit):
+            rank = bisect.bisect_right(self.starts, offset) - 1
+            position = self.by_popularity[rank]
+            if offset != self.starts[rank]:
+                found.append(position)
+            offset = self.haystack.find(query, self.starts[rank + 1])
+        return found
+
+    def search(self, query, limit=None):
+        """Prefix matches first, then substring matches.
+
+        Ties are ordered by popularity, then by name.
+        """
+        query = query.casefold()
+        if not query or SEPARATOR in query:
+            return []
+        start = bisect.bisect_left(self.names, query)
+        end = bisect.bisect_left(self.names, query + '\U0010ffff', start)
+        found = sorted(
+            range(start, end),
+            key=lambda position: (-self.popularity[position], position)
+        )
+        if limit is None or len(found) < limit:
+            found.extend(self.find_substrings(
+                query, None if limit is None else limit - len(found)
+            ))
+        return [self.items[position] for position in found[:limit]]
+
+
+_lock = threading.Lock()
+_index = None
+_version = None
+_built = 0
+
+
+def load_index():
+    return IngredientIndex(
+        Ingredient.objects.order_by().annotate(
+            popularity=Count('ingredient')
+        ).values_list('id', 'name', 'measurement_unit', 'popularity')
+    )
+
+
+def is_fresh(version):
+    return (
+        _index is not None and _version == version
+        and time.monotonic() - _built < settings.INGREDIENT_INDEX_TTL
+    )
+
+
+def get_index():
+    """Index of this worker, rebuilt when it is outdated."""
+    global _index, _version, _built
+    version = get_version(VERSION_NAME)
+    if is_fresh(version):
+        return _index
+    with _lock:
+        if not is_fresh(version):
+            _index = load_index()
+            _version = version
+            _built = time.monotonic()
+    return _index
+
+
+def search(query, limit=None):
+    return get_index().search(query, limit)
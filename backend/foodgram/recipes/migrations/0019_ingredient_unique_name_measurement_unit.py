@@ -0,0 +1,44 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        keep = duplicate.pop('keep')
+        duplicate.pop('total')
+        for other in Ingredient.objects.filter(**duplicate).exclude(id=keep):
+            RecipeIngredient.objects.filter(
+                ingredient=other,
+                recipe__in=RecipeIngredient.objects.filter(
+                    ingredient_id=keep
+                ).values('recipe'),
+            ).delete()
+            RecipeIngredient.objects.filter(
+                ingredient=other
+            ).update(ingredient_id=keep)
+            other.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_alter_recipeingredient_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_name_measurement_unit'
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1 on 2026-10-17 06:09
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0023_recipe_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=core.storage.ContentAddressedStorage(), upload_to='static/recipes/', verbose_name='Картинка'),
+        ),
+    ]
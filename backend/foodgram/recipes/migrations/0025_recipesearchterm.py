@@ -0,0 +1,65 @@
+# Generated by Django 4.1 on 2026-10-17 06:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SEARCH_INDEX = 'recipe_search_vector_idx'
+
+
+def search_index():
+    # Same expression as recipes.search.search_vector(), so that the
+    # search filter can use the index.
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    return GinIndex(
+        SearchVector('name', weight='A', config='russian')
+        + SearchVector('text', weight='B', config='russian'),
+        name=SEARCH_INDEX,
+    )
+
+
+def add_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(
+            apps.get_model('recipes', 'Recipe'), search_index()
+        )
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(
+            apps.get_model('recipes', 'Recipe'), search_index()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0024_recipe_image_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа слова')),
+                ('weight', models.PositiveIntegerField(verbose_name='Вес')),
+            ],
+            options={
+                'verbose_name': 'Поисковый терм рецепта',
+                'verbose_name_plural': 'Поисковые термы рецептов',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipesearchterm',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipesearchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'recipe'), name='unique_search_term'),
+        ),
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
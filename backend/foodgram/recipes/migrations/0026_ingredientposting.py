@@ -0,0 +1,62 @@
+# Generated by Django 4.1 on 2026-10-17 06:23
+
+import collections
+from array import array
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BLOCK_SIZE = 1 << 16
+
+
+def fill_postings(apps, schema_editor):
+    IngredientPosting = apps.get_model('recipes', 'IngredientPosting')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    offsets = collections.defaultdict(list)
+    for ingredient_id, recipe_id in RecipeIngredient.objects.values_list(
+        'ingredient_id', 'recipe_id'
+    ).iterator():
+        block, offset = divmod(recipe_id, BLOCK_SIZE)
+        offsets[ingredient_id, block].append(offset)
+    IngredientPosting.objects.bulk_create(
+        (
+            IngredientPosting(
+                ingredient_id=ingredient_id, block=block,
+                recipe_ids=array('H', sorted(block_offsets)).tobytes(),
+            )
+            for (ingredient_id, block), block_offsets in offsets.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0025_recipesearchterm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block', models.PositiveIntegerField(verbose_name='Блок идентификаторов рецептов')),
+                ('recipe_ids', models.BinaryField(verbose_name='Смещения рецептов в блоке')),
+            ],
+            options={
+                'verbose_name': 'Рецепты ингредиента',
+                'verbose_name_plural': 'Рецепты ингредиентов',
+            },
+        ),
+        migrations.AddField(
+            model_name='ingredientposting',
+            name='ingredient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='recipes.ingredient', verbose_name='Ингредиент'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredientposting',
+            constraint=models.UniqueConstraint(fields=('ingredient', 'block'), name='unique_ingredient_block'),
+        ),
+        migrations.RunPython(fill_postings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-17 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0030_recipe_author_latest_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglistjob',
+            name='started',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Начато'),
+        ),
+    ]
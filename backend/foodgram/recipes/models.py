@@ -1,8 +1,13 @@
+import uuid
+
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.db.models.functions import Upper
 
+from core.models import MaintainedFieldsMixin
+from core.storage import ContentAddressedStorage
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -14,6 +19,12 @@ class Ingredient(models.Model):
 
     class Meta:
         ordering = [Upper('name'), ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_name_measurement_unit'
+            ),
+        ]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
 
@@ -43,7 +54,7 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(MaintainedFieldsMixin, models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -63,7 +74,13 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         'Картинка',
-        upload_to='static/recipes/')
+        upload_to='static/recipes/',
+        storage=ContentAddressedStorage())
+    thumbnails = models.JSONField(
+        'Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False)
     text = models.TextField(
         'Способ приготовления')
     cooking_time = models.PositiveIntegerField(
@@ -74,11 +91,41 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        'Число добавлений в избранное',
+        default=0,
+        editable=False)
+    carts_count = models.PositiveIntegerField(
+        'Число добавлений в список покупок',
+        default=0,
+        editable=False)
+    similar_outdated = models.BooleanField(
+        'Похожие рецепты устарели',
+        default=True,
+        editable=False)
+
+    # Written by queryset updates only: counters, the thumbnails job and
+    # the similar recipes build.
+    maintained_fields = (
+        'favorites_count', 'carts_count', 'thumbnails', 'similar_outdated',
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            # Latest recipes of an author: previews and timelines.
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_latest_idx',
+            ),
+            models.Index(
+                fields=['id'],
+                condition=models.Q(similar_outdated=True),
+                name='recipe_similar_outdated_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -127,6 +174,10 @@ class Favorite(models.Model):
         verbose_name='Рецепт',
         related_name='favorites'
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True)
 
     class Meta:
         constraints = [
@@ -156,6 +207,10 @@ class ShoppingCart(models.Model):
         verbose_name='Рецепт',
         related_name='carts'
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True)
 
     class Meta:
         constraints = [
@@ -169,3 +224,223 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user.username} {self.recipe}'
+
+
+class CartIngredient(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='cart_ingredients'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+        related_name='cart_totals'
+    )
+    total_amount = models.PositiveIntegerField(
+        'Общее количество'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_cart_ingredient',
+            ),
+        ]
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списков покупок'
+
+    def __str__(self):
+        return f'{self.user.username} {self.ingredient} {self.total_amount}'
+
+
+class RecipeSearchTerm(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='search_terms'
+    )
+    term = models.CharField(
+        'Основа слова',
+        max_length=64)
+    weight = models.PositiveIntegerField(
+        'Вес')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'recipe'],
+                name='unique_search_term',
+            ),
+        ]
+        verbose_name = 'Поисковый терм рецепта'
+        verbose_name_plural = 'Поисковые термы рецептов'
+
+    def __str__(self):
+        return f'{self.term} {self.recipe_id} {self.weight}'
+
+
+class IngredientPosting(models.Model):
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+        related_name='postings'
+    )
+    block = models.PositiveIntegerField(
+        'Блок идентификаторов рецептов')
+    recipe_ids = models.BinaryField(
+        'Смещения рецептов в блоке')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ingredient', 'block'],
+                name='unique_ingredient_block',
+            ),
+        ]
+        verbose_name = 'Рецепты ингредиента'
+        verbose_name_plural = 'Рецепты ингредиентов'
+
+    def __str__(self):
+        return f'{self.ingredient_id} {self.block}'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик',
+        related_name='timeline'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='timeline_entries'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_timeline_entry',
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+
+    def __str__(self):
+        return f'{self.user_id} {self.recipe_id}'
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='neighbours'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Похожий рецепт',
+        related_name='+'
+    )
+    score = models.FloatField(
+        'Сходство')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_similar_recipe',
+            ),
+        ]
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+    def __str__(self):
+        return f'{self.recipe_id} {self.similar_id} {self.score:.3f}'
+
+
+class TrendingRecipe(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Рецепт',
+        related_name='trending'
+    )
+    score = models.FloatField(
+        'Популярность')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='trending_score_idx'),
+        ]
+        verbose_name = 'Популярный рецепт'
+        verbose_name_plural = 'Популярные рецепты'
+
+    def __str__(self):
+        return f'{self.recipe_id} {self.score:.3f}'
+
+
+class ShoppingListJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='shopping_list_jobs'
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        db_index=True)
+    file = models.FileField(
+        'Файл',
+        upload_to='shopping_lists/',
+        blank=True)
+    error = models.TextField(
+        'Ошибка',
+        blank=True)
+    created = models.DateTimeField(
+        'Создано',
+        auto_now_add=True)
+    started = models.DateTimeField(
+        'Начато',
+        null=True,
+        blank=True)
+    finished = models.DateTimeField(
+        'Завершено',
+        null=True,
+        blank=True)
+
+    class Meta:
+        verbose_name = 'Формирование списка покупок'
+        verbose_name_plural = 'Формирование списков покупок'
+        ordering = ('created',)
+
+    def __str__(self):
+        return f'{self.user.username} {self.status}'
@@ -0,0 +1,296 @@
+"""Ingredient to recipe inverted index.
+
+``IngredientPosting`` keeps the recipes of an ingredient as a sorted
+array of 16-bit offsets, one row per block of ``BLOCK_SIZE`` recipe ids,
+so adding a recipe rewrites one small row, not the whole list of a
+popular ingredient. ``RecipeSerializer`` applies every ingredient change
+here; ``rebuild`` compares the index with ``RecipeIngredient``.
+
+Ingredient filters load the postings of the requested ingredients with
+one query and intersect them in memory instead of joining
+``RecipeIngredient`` once per ingredient or grouping it over the whole
+table; excluded ingredients are taken from their postings as well. The
+other filters of the request are applied by looking the found ids up by
+primary key. The ids go to the database as one parameter: a literal
+list of every found id made queries of hundreds of kilobytes on a large
+catalogue. The found recipes are ranked in memory and a page loads only
+the recipes of its ids.
+"""
+import bisect
+import collections
+import json
+from array import array
+
+from django.db import connections, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import IngredientPosting, RecipeIngredient
+
+BLOCK_BITS = 16
+BLOCK_SIZE = 1 << BLOCK_BITS
+TYPECODE = 'H'
+INGREDIENTS_BATCH_SIZE = 100
+
+
+def encode(offsets):
+    return array(TYPECODE, sorted(offsets)).tobytes()
+
+
+def decode(data):
+    offsets = array(TYPECODE)
+    offsets.frombytes(data)
+    return offsets
+
+
+def blocks(recipe_ids):
+    """Recipe ids grouped as {block: [offset, ...]}."""
+    grouped = collections.defaultdict(list)
+    for recipe_id in recipe_ids:
+        block, offset = divmod(recipe_id, BLOCK_SIZE)
+        grouped[block].append(offset)
+    return grouped
+
+
+def recipe_changed(recipe_id, added=(), removed=()):
+    """Add the recipe to the ``added`` ingredients, drop it from others.
+
+    Runs inside the caller's transaction. Rows are locked in ingredient
+    order, so concurrent recipe writes sharing ingredients are
+    serialized and cannot deadlock.
+    """
+    changes = dict.fromkeys(removed, False)
+    changes.update(dict.fromkeys(added, True))
+    if not changes:
+        return
+    block, offset = divmod(recipe_id, BLOCK_SIZE)
+    added = sorted(pk for pk, add in changes.items() if add)
+    if added:
+        IngredientPosting.objects.bulk_create(
+            (
+                IngredientPosting(
+                    ingredient_id=pk, block=block, recipe_ids=b''
+                )
+                for pk in added
+            ),
+            ignore_conflicts=True,
+        )
+    changed, emptied = [], []
+    for row in IngredientPosting.objects.select_for_update().filter(
+        block=block, ingredient_id__in=changes
+    ).order_by('ingredient_id'):
+        offsets = decode(row.recipe_ids)
+        position = bisect.bisect_left(offsets, offset)
+        present = position < len(offsets) and offsets[position] == offset
+        if changes[row.ingredient_id] == present:
+            continue
+        if present:
+            del offsets[position]
+        else:
+            offsets.insert(position, offset)
+        if offsets:
+            row.recipe_ids = offsets.tobytes()
+            changed.append(row)
+        else:
+            emptied.append(row.pk)
+    if changed:
+        IngredientPosting.objects.bulk_update(changed, ['recipe_ids'])
+    if emptied:
+        IngredientPosting.objects.filter(pk__in=emptied).delete()
+
+
+def recipe_deleted(recipe_id):
+    """Drop the recipe from the index; call before deleting it."""
+    recipe_changed(recipe_id, removed=RecipeIngredient.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient_id', flat=True))
+
+
+def load(ingredient_ids):
+    """{ingredient id: set of recipe ids} of the ingredients."""
+    recipes = {pk: set() for pk in ingredient_ids}
+    for ingredient_id, block, data in IngredientPosting.objects.filter(
+        ingredient_id__in=recipes
+    ).values_list('ingredient_id', 'block', 'recipe_ids').iterator():
+        start = block * BLOCK_SIZE
+        recipes[ingredient_id].update(
+            start + offset for offset in decode(data)
+        )
+    return recipes
+
+
+def coverage(include, exclude=(), max_missing=0):
+    """{recipe id: number of ``include`` ingredients in the recipe}.
+
+    Only recipes missing at most ``max_missing`` of the ``include``
+    ingredients (but having at least one) and none of ``exclude`` are
+    returned.
+    """
+    include, exclude = set(include), set(exclude)
+    recipes = load(include | exclude)
+    required = max(len(include) - max_missing, 1)
+    if required == len(include):
+        found = set.intersection(*sorted(
+            (recipes[pk] for pk in include), key=len
+        ))
+        counts = dict.fromkeys(found, len(include))
+    else:
+        counts = collections.Counter()
+        for pk in include:
+            counts.update(recipes[pk])
+        counts = {
+            recipe_id: count for recipe_id, count in counts.items()
+            if count >= required
+        }
+    for pk in exclude:
+        for recipe_id in recipes[pk]:
+            counts.pop(recipe_id, None)
+    return counts
+
+
+class RankedRecipes:
+    """Recipes of a queryset in the order of ``recipe_ids``.
+
+    Stands in for the queryset in the recipe views: it counts without a
+    query and a slice loads only the recipes of that slice, so the ids
+    of all the found recipes never go into the SQL.
+    """
+
+    def __init__(self, queryset, recipe_ids):
+        self.queryset = queryset
+        self.recipe_ids = recipe_ids
+        self.model = queryset.model
+
+    def prefetch_related(self, *lookups):
+        return RankedRecipes(
+            self.queryset.prefetch_related(*lookups), self.recipe_ids
+        )
+
+    def values(self, *fields):
+        return RankedRecipes(self.queryset.values(*fields), self.recipe_ids)
+
+    def get(self, **kwargs):
+        recipe = self.queryset.get(**kwargs)
+        if recipe_pk(recipe) not in self.recipe_ids:
+            raise self.model.DoesNotExist
+        return recipe
+
+    def count(self):
+        return len(self.recipe_ids)
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def __getitem__(self, key):
+        recipe_ids = (
+            self.recipe_ids[key] if isinstance(key, slice)
+            else [self.recipe_ids[key]]
+        )
+        recipes = {
+            recipe_pk(recipe): recipe
+            for recipe in self.queryset.filter(pk__in=recipe_ids)
+        }
+        page = [recipes[pk] for pk in recipe_ids if pk in recipes]
+        return page if isinstance(key, slice) else page[0]
+
+
+def recipe_pk(recipe):
+    return recipe['id'] if isinstance(recipe, dict) else recipe.pk
+
+
+def id_list(ids, using):
+    """Subquery over ``ids`` passed as a single query parameter."""
+    ids = sorted(ids)
+    if connections[using].vendor == 'postgresql':
+        return RawSQL('SELECT unnest(%s::integer[])', (ids,))
+    return RawSQL('SELECT value FROM json_each(%s)', (json.dumps(ids),))
+
+
+def rank_by_coverage(queryset, counts):
+    """Recipes of ``counts`` in the queryset, more ingredients first.
+
+    Ties keep the current ordering of the queryset. The found ids are
+    looked up by primary key with one query and ranked in memory; the
+    result is ``RankedRecipes``.
+    """
+    if not counts:
+        return queryset.none()
+    ordering = queryset.query.order_by or ('-pub_date', '-id')
+    recipe_ids = list(queryset.filter(
+        pk__in=id_list(counts, queryset.db)
+    ).order_by(*ordering).values_list('pk', flat=True))
+    recipe_ids.sort(key=lambda pk: -counts[pk])
+    return RankedRecipes(queryset, recipe_ids)
+
+
+def excluding(queryset, ingredient_ids):
+    """Recipes of the queryset having none of the ingredients."""
+    excluded = set().union(*load(ingredient_ids).values())
+    if not excluded:
+        return queryset
+    return queryset.exclude(pk__in=id_list(excluded, queryset.db))
+
+
+def stored_postings(ingredient_ids):
+    return {
+        (ingredient_id, block): sorted(decode(data))
+        for ingredient_id, block, data in IngredientPosting.objects.filter(
+            ingredient_id__in=ingredient_ids
+        ).values_list('ingredient_id', 'block', 'recipe_ids').iterator()
+    }
+
+
+def expected_postings(ingredient_ids):
+    recipes = collections.defaultdict(list)
+    for ingredient_id, recipe_id in RecipeIngredient.objects.filter(
+        ingredient_id__in=ingredient_ids
+    ).values_list('ingredient_id', 'recipe_id').iterator():
+        recipes[ingredient_id].append(recipe_id)
+    return {
+        (ingredient_id, block): sorted(offsets)
+        for ingredient_id, recipe_ids in recipes.items()
+        for block, offsets in blocks(recipe_ids).items()
+    }
+
+
+def rebuild(fix=True, batch_size=INGREDIENTS_BATCH_SIZE):
+    """Compare the index with ``RecipeIngredient``, fix it if asked.
+
+    Returns the number of drifted (ingredient, block) rows.
+    """
+    ingredient_ids = sorted(
+        set(RecipeIngredient.objects.values_list(
+            'ingredient_id', flat=True
+        ).distinct())
+        | set(IngredientPosting.objects.values_list(
+            'ingredient_id', flat=True
+        ).distinct())
+    )
+    drift = 0
+    for start in range(0, len(ingredient_ids), batch_size):
+        batch = ingredient_ids[start:start + batch_size]
+        expected = expected_postings(batch)
+        stored = stored_postings(batch)
+        drifted = {
+            key for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        }
+        drift += len(drifted)
+        if not fix or not drifted:
+            continue
+        drifted_ingredients = {ingredient_id for ingredient_id, _ in drifted}
+        with transaction.atomic():
+            IngredientPosting.objects.filter(
+                ingredient_id__in=drifted_ingredients
+            ).delete()
+            IngredientPosting.objects.bulk_create(
+                (
+                    IngredientPosting(
+                        ingredient_id=ingredient_id, block=block,
+                        recipe_ids=encode(offsets),
+                    )
+                    for (ingredient_id, block), offsets in expected.items()
+                    if ingredient_id in drifted_ingredients
+                ),
+                batch_size=1000,
+            )
+    return drift
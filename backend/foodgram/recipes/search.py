@@ -0,0 +1,188 @@
+"""Full-text recipe search ranked by relevance.
+
+On PostgreSQL a recipe matches when its weighted ``tsvector`` (name with
+weight A, text with weight B, ``russian`` configuration) matches the
+query, and results are ranked with ``ts_rank``. Migration 0025 builds a
+GIN index over exactly this expression, so the filter is an index scan.
+
+Other databases, e.g. the SQLite used by the tests, use
+``RecipeSearchTerm``: an inverted index of word stems with weights,
+updated on every recipe save. A recipe matches when it has every stem
+of the query and ranks by their summed weight. The stemmer only strips
+common Russian endings; it is used for both indexing and queries, so
+forms of one word meet at the same stem.
+"""
+import collections
+import re
+
+from django.db import connections, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+
+from .models import Recipe, RecipeSearchTerm
+
+CONFIG = 'russian'
+NAME_WEIGHT = 4
+TEXT_WEIGHT = 1
+MIN_STEM_LENGTH = 3
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 10
+RECIPES_BATCH_SIZE = 1000
+
+WORD = re.compile(r'\w+')
+REFLEXIVE_ENDINGS = ('ся', 'сь')
+ENDINGS = sorted((
+    # adjectives and participles
+    'ыми', 'ими', 'ого', 'его', 'ому', 'ему', 'ая', 'яя', 'ое', 'ее',
+    'ые', 'ие', 'ый', 'ий', 'ой', 'ую', 'юю', 'ых', 'их', 'ым', 'им',
+    # nouns
+    'ами', 'ями', 'иями', 'ах', 'ях', 'ам', 'ям', 'ов', 'ев', 'ей',
+    'ом', 'ем', 'ию', 'ия', 'ы', 'и', 'а', 'я', 'о', 'е', 'у',
+    'ю', 'й',
+    # infinitives
+    'ать', 'ять', 'ить', 'еть', 'уть', 'ти',
+), key=len, reverse=True)
+
+
+def strip_ending(word, endings):
+    for ending in endings:
+        if (
+            word.endswith(ending)
+            and len(word) - len(ending) >= MIN_STEM_LENGTH
+        ):
+            return word[:-len(ending)]
+    return word
+
+
+def stem(word):
+    word = word.casefold().replace('ё', 'е')
+    word = strip_ending(word, REFLEXIVE_ENDINGS)
+    word = strip_ending(word, ENDINGS)
+    return strip_ending(word, ('ь',))[:MAX_TERM_LENGTH]
+
+
+def terms(text):
+    return [stem(word) for word in WORD.findall(text)]
+
+
+def weights(name, text):
+    """Stem -> weight of a recipe with the given name and text."""
+    counter = collections.Counter()
+    for term in terms(name):
+        counter[term] += NAME_WEIGHT
+    for term in terms(text):
+        counter[term] += TEXT_WEIGHT
+    return counter
+
+
+def uses_postgres(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def search_vector():
+    # Must stay in sync with the index of migration 0025.
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector('name', weight='A', config=CONFIG)
+        + SearchVector('text', weight='B', config=CONFIG)
+    )
+
+
+def write_terms(recipe_id, stored, wanted):
+    """Replace the ``stored`` weights of a recipe with ``wanted`` ones."""
+    stale = [term for term in stored if stored[term] != wanted.get(term)]
+    if stale:
+        RecipeSearchTerm.objects.filter(
+            recipe_id=recipe_id, term__in=stale
+        ).delete()
+    fresh = [term for term in wanted if wanted[term] != stored.get(term)]
+    if fresh:
+        RecipeSearchTerm.objects.bulk_create(
+            RecipeSearchTerm(
+                recipe_id=recipe_id, term=term, weight=wanted[term]
+            )
+            for term in fresh
+        )
+
+
+def index_recipe(recipe, created=False):
+    """Bring the inverted index of a saved recipe up to date."""
+    if uses_postgres(recipe._state.db):
+        return
+    stored = {} if created else dict(
+        RecipeSearchTerm.objects.filter(recipe=recipe).values_list(
+            'term', 'weight'
+        )
+    )
+    write_terms(recipe.id, stored, weights(recipe.name, recipe.text))
+
+
+def stored_terms(recipe_ids):
+    stored = collections.defaultdict(dict)
+    for recipe_id, term, weight in RecipeSearchTerm.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'term', 'weight').iterator():
+        stored[recipe_id][term] = weight
+    return stored
+
+
+def rebuild(fix=True, batch_size=RECIPES_BATCH_SIZE):
+    """Compare the inverted index with the recipes, fix it if asked.
+
+    Returns the number of recipes whose terms drifted. Terms of deleted
+    recipes go away with them, so only existing recipes are checked.
+    """
+    if uses_postgres(Recipe.objects.db):
+        return 0
+    drift = 0
+    last_id = 0
+    while True:
+        recipes = list(
+            Recipe.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'name', 'text')[:batch_size]
+        )
+        if not recipes:
+            return drift
+        last_id = recipes[-1][0]
+        stored = stored_terms([recipe_id for recipe_id, _, _ in recipes])
+        with transaction.atomic():
+            for recipe_id, name, text in recipes:
+                wanted = weights(name, text)
+                if stored[recipe_id] == wanted:
+                    continue
+                drift += 1
+                if fix:
+                    write_terms(recipe_id, stored[recipe_id], wanted)
+
+
+def search(queryset, query):
+    """Recipes of ``queryset`` matching ``query``, most relevant first.
+
+    The rank is exposed as the ``search_rank`` annotation.
+    """
+    if uses_postgres(queryset.db):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        vector = search_vector()
+        query = SearchQuery(query, config=CONFIG)
+        queryset = queryset.alias(search_vector=vector).filter(
+            search_vector=query
+        ).annotate(search_rank=SearchRank(vector, query))
+    else:
+        query_terms = list(dict.fromkeys(terms(query)))[:MAX_QUERY_TERMS]
+        if not query_terms:
+            return queryset.none()
+        matches = RecipeSearchTerm.objects.filter(
+            term__in=query_terms
+        ).order_by().values('recipe').annotate(
+            matched=Count('id')
+        ).filter(matched=len(query_terms)).values('recipe')
+        rank = RecipeSearchTerm.objects.filter(
+            recipe=OuterRef('pk'), term__in=query_terms
+        ).order_by().values('recipe').annotate(
+            rank=Sum('weight')
+        ).values('rank')
+        queryset = queryset.filter(pk__in=matches).annotate(
+            search_rank=Subquery(rank)
+        )
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
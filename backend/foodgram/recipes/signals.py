@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.versions import bump_version
+
+from . import search, thumbnails
+from .ingredient_index import VERSION_NAME as INGREDIENTS_VERSION
+from .models import Ingredient, Recipe, Tag
+
+TAGS_VERSION = 'tags'
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    bump_version(INGREDIENTS_VERSION)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tags_changed(sender, **kwargs):
+    bump_version(TAGS_VERSION)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    search.index_recipe(instance, created)
+    if thumbnails.is_outdated(instance):
+        thumbnails.schedule(instance)
@@ -0,0 +1,164 @@
+"""Recipe image thumbnails.
+
+Every uploaded image gets resized copies of ``RECIPE_THUMBNAIL_WIDTHS``
+in WebP and JPEG, stored next to the originals. ``Recipe.thumbnails``
+maps the format and width to the stored file and remembers the source
+image, so a copy is made once per upload. Files are shared by every
+recipe with the same image, so replaced copies are left to
+``collect_media_garbage``. With
+``RECIPE_THUMBNAILS_MODE = 'thread'`` the copies are made in a small
+thread pool after the upload commits, ``'sync'`` makes them at once.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+THUMBNAILS_DIR = 'static/recipes/thumbnails/'
+# extension: (Pillow format, save options)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+BACKGROUND = (255, 255, 255)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.RECIPE_THUMBNAILS_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def get_storage():
+    return Recipe._meta.get_field('image').storage
+
+
+def is_outdated(recipe):
+    return bool(recipe.image) and (
+        recipe.thumbnails.get('source') != recipe.image.name
+    )
+
+
+def widths_for(image):
+    """Configured widths narrower than the image, or its own width."""
+    widths = [
+        width for width in settings.RECIPE_THUMBNAIL_WIDTHS
+        if width < image.width
+    ]
+    return widths or [image.width]
+
+
+def flatten(image):
+    """JPEG has no alpha channel: put the image on a white background."""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, BACKGROUND)
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render(image, width, extension):
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.Resampling.LANCZOS)
+    pillow_format, options = FORMATS[extension]
+    if pillow_format == 'JPEG':
+        resized = flatten(resized)
+    buffer = io.BytesIO()
+    resized.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+def thumbnail_name(source, width, extension):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f'{THUMBNAILS_DIR}{stem}_{width}.{extension}'
+
+
+def stored_names(thumbnails):
+    return {
+        name
+        for extension in FORMATS
+        for name in thumbnails.get(extension, {}).values()
+    }
+
+
+def generate(recipe_id):
+    """Make the thumbnails of the recipe's current image.
+
+    Returns the new thumbnail map, or None when the recipe is gone.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'thumbnails'
+    ).first()
+    if recipe is None or not recipe.image:
+        return None
+    source = recipe.image.name
+    storage = get_storage()
+    with storage.open(source, 'rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    thumbnails = {'source': source}
+    for extension in FORMATS:
+        thumbnails[extension] = {
+            str(width): storage.save(
+                thumbnail_name(source, width, extension),
+                ContentFile(render(image, width, extension)),
+            )
+            for width in widths_for(image)
+        }
+    # The image may have been replaced while the copies were made.
+    Recipe.objects.filter(pk=recipe_id, image=source).update(
+        thumbnails=thumbnails
+    )
+    return thumbnails
+
+
+def run_in_thread(recipe_id):
+    try:
+        generate(recipe_id)
+    except Exception:
+        logger.exception('Thumbnails of recipe %s failed', recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule(recipe):
+    """Make thumbnails of a new image once the upload is committed."""
+    if settings.RECIPE_THUMBNAILS_MODE == 'sync':
+        transaction.on_commit(lambda: generate(recipe.id))
+    else:
+        transaction.on_commit(
+            lambda: get_executor().submit(run_in_thread, recipe.id)
+        )
+
+
+def srcset(thumbnails, build_url=None):
+    """``srcset`` value per format: "<url> <width>w, ..."."""
+    storage = get_storage()
+    build_url = build_url or (lambda url: url)
+    return {
+        extension: ', '.join(
+            f'{build_url(storage.url(name))} {width}w'
+            for width, name in sorted(
+                thumbnails[extension].items(),
+                key=lambda item: int(item[0])
+            )
+        )
+        for extension in FORMATS
+        if thumbnails.get(extension)
+    }
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_user_relations(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    for field, app_label, model_name in (
+        ('recipes_count', 'recipes', 'Recipe'),
+        ('followers_count', 'users', 'Follow'),
+    ):
+        model = apps.get_model(app_label, model_name)
+        User.objects.update(**{field: Coalesce(Subquery(
+            model.objects.filter(author=OuterRef('pk')).order_by().values(
+                'author'
+            ).annotate(total=Count('pk')).values('total')
+        ), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_follow_follow_unique_follow'),
+        ('recipes', '0020_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число рецептов'),
+        ),
+        migrations.RunPython(
+            count_user_relations, migrations.RunPython.noop
+        ),
+    ]
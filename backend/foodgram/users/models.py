@@ -1,8 +1,10 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from core.models import MaintainedFieldsMixin
 
-class User(AbstractUser):
+
+class User(MaintainedFieldsMixin, AbstractUser):
     email = models.EmailField(
         'Адрес электронной почты',
         max_length=254,
@@ -21,10 +23,23 @@ class User(AbstractUser):
         'Фамилия',
         max_length=150
     )
+    recipes_count = models.PositiveIntegerField(
+        'Число рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+        editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
+    # Written by queryset updates only, see core.counters.
+    maintained_fields = ('recipes_count', 'followers_count')
+
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'